@@ -0,0 +1,131 @@
+"""Streamlit-free analytics for the food access dashboard.
+
+Everything here works on plain pandas frames, so it can run in the batch
+precompute job (``precompute.py``), in notebooks or in tests without
+importing Streamlit or executing the page.
+"""
+import numpy as np
+import pandas as pd
+
+SUMMARY_RENAMES = {
+    "MedianFamilyIncome": "Median Family Income ($)",
+    "PovertyRate": "Poverty Rate (%)",
+    "Pct_Households_No_Vehicle": "% Without Vehicle",
+}
+
+# Tract columns county_summary reads
+COUNTY_SUMMARY_COLUMNS = ["County", "LILATracts_1And10", "CensusTract", "Pct_Households_No_Vehicle",
+                          "MedianFamilyIncome", "PovertyRate"]
+
+# Plotly formats hover labels client-side from customdata, so no per-row Python strings
+COUNTY_HOVER_COLUMNS = ["County", "% LILA Tracts", "Median Family Income ($)", "Poverty Rate (%)", "% Without Vehicle"]
+COUNTY_HOVER_TEMPLATE = (
+    "County: %{customdata[0]}<br>"
+    "% LILA Tracts: %{customdata[1]:.2f}<br>"
+    "Median Income: $%{customdata[2]:,.0f}<br>"
+    "Poverty Rate (%): %{customdata[3]:.2f}<br>"
+    "% Without Vehicle: %{customdata[4]:.2f}"
+    "<extra></extra>"
+)
+
+# Tract map: metric column -> (label, d3 hover format)
+TRACT_MAP_METRICS = {
+    "LowAccessPopulation": ("Low-Access Population", ",.0f"),
+    "PovertyRate": ("Poverty Rate (%)", ".2f"),
+    "Pct_Households_No_Vehicle": ("% Households Without Vehicle", ".2f"),
+}
+
+
+def add_derived_columns(df):
+    """Add the dashboard's derived tract columns in place and return ``df``."""
+    households = df["OHU2010"].to_numpy(dtype="float64", na_value=np.nan)
+    no_vehicle = df["TractHUNV"].to_numpy(dtype="float64", na_value=np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["Pct_Households_No_Vehicle"] = no_vehicle / households * 100
+    df["LowAccessPopulation"] = df["LALOWI05_10"].fillna(0)
+    return df
+
+
+def summary_metrics(df):
+    """Headline metrics: tract count, % LILA tracts, average poverty rate and income."""
+    total_tracts = len(df)
+    return {
+        "total_tracts": total_tracts,
+        "percent_LILA": float(df["LILATracts_1And10"].sum() / total_tracts * 100) if total_tracts else 0.0,
+        "avg_poverty": float(df["PovertyRate"].mean()),
+        "avg_income": float(df["MedianFamilyIncome"].mean()),
+    }
+
+
+def county_summary(df, county_fips=None):
+    """Per-county LILA share and averages, with a FIPS column for the map.
+
+    Counties in ``county_fips`` without any tracts get a zero row so the map
+    has no holes.
+    """
+    summary = df.groupby("County", as_index=False, observed=True).agg({
+        "LILATracts_1And10": "sum",
+        "CensusTract": "count",
+        "Pct_Households_No_Vehicle": "mean",
+        "MedianFamilyIncome": "mean",
+        "PovertyRate": "mean"})
+    summary["County"] = summary["County"].astype(str)
+    summary["% LILA Tracts"] = summary["LILATracts_1And10"] / summary["CensusTract"] * 100
+    summary = summary.round(2).rename(columns=SUMMARY_RENAMES)
+    if county_fips is None:
+        return summary
+
+    summary["fips"] = summary["County"].map(county_fips)
+    # Geometry and data can name the same county differently ("Orleans" vs "Orleans
+    # Parish"), so counties without tracts are the FIPS codes the data doesn't cover
+    covered = set(summary["fips"].dropna())
+    missing = {}
+    for name, fips in county_fips.items():
+        if fips not in covered:
+            missing.setdefault(fips, name)
+    if missing:
+        fallback = pd.DataFrame({
+            "County": list(missing.values()),
+            "LILATracts_1And10": 0,
+            "CensusTract": 1,
+            "% LILA Tracts": 0.0,
+            "Median Family Income ($)": 0.0,
+            "Poverty Rate (%)": 0.0,
+            "% Without Vehicle": 0.0,
+            "fips": list(missing)})
+        summary = pd.concat([summary, fallback], ignore_index=True)
+    # One row per FIPS, or Plotly draws the later row over the county
+    summary = summary[summary["fips"].isna() | ~summary["fips"].duplicated()]
+    return summary.reset_index(drop=True)
+
+
+def county_hover_data(summary):
+    """``customdata`` array matching ``COUNTY_HOVER_TEMPLATE``."""
+    return summary[COUNTY_HOVER_COLUMNS].to_numpy(dtype=object)
+
+
+def tract_geoids(df):
+    """11-digit tract GEOIDs (zero-padded ``CensusTract``) as strings."""
+    return df["CensusTract"].astype("int64").astype(str).str.zfill(11)
+
+
+def tract_hover_data(df):
+    """``customdata`` array matching ``tract_hover_template``: GEOID, county, population, income."""
+    return np.column_stack([
+        tract_geoids(df).to_numpy(dtype=object),
+        df["County"].astype(str).to_numpy(dtype=object),
+        df["Pop2010"].to_numpy(dtype="float64", na_value=np.nan),
+        df["MedianFamilyIncome"].to_numpy(dtype="float64", na_value=np.nan),
+    ])
+
+
+def tract_hover_template(metric):
+    label, fmt = TRACT_MAP_METRICS[metric]
+    return (
+        "Census Tract: %{customdata[0]}<br>"
+        "County: %{customdata[1]}<br>"
+        f"{label}: %{{z:{fmt}}}<br>"
+        "Population: %{customdata[2]:,.0f}<br>"
+        "Median Income: $%{customdata[3]:,.0f}"
+        "<extra></extra>"
+    )
@@ -0,0 +1,376 @@
+"""Headless benchmark of dashboard reruns.
+
+    python benchmark.py [--rows 10000 72000 1000000] [--csv FILE ...] [--repeat 2] [--out bench_results.json]
+    python benchmark.py --startup 5 [--rows ...] [--csv FILE ...]
+
+For each dataset the dashboard is driven through Streamlit's ``AppTest`` the
+way a user would: first load with the map opened, then changing County, adding compare counties,
+toggling Urban Tracts Only, narrowing the income slider and switching every
+``Select view:`` option. Each step records the rerun wall time split by
+section, peak RSS and the serialized size of every chart sent to the client.
+
+Synthetic datasets are bootstrapped from the bundled CSV (same columns, NULLs
+and county mix) and scaled to the requested row count. Every dataset runs in
+its own process with its own snapshot/partition/artifact directories, so peak
+RSS and cache state are per dataset. Results are written as JSON so runs from
+different commits can be compared.
+
+``--startup N`` measures cold starts instead: N fresh processes per dataset,
+each timing the first page load to its first rendered element (time to first
+paint) and to the end of the script, which heavy modules were already
+imported at first paint, and what each of them cost to import
+(``python -X importtime``).
+"""
+import argparse
+import collections
+import functools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+APP = ROOT / "streamlit_app.py"
+TEMPLATE_CSV = ROOT / "Massachusetts Food Access Data - Sheet1.csv"
+BENCH_DIR = Path(os.environ.get("FOOD_ACCESS_BENCH_DIR", ROOT / ".bench"))
+
+DEFAULT_ROWS = [10_000, 72_000, 1_000_000]
+
+# Float columns jittered in synthetic data so resampled tracts don't stack on the same point
+JITTER_COLUMNS = ["PovertyRate", "MedianFamilyIncome"]
+
+CHART_ELEMENTS = ["vega_lite_chart", "plotly_chart"]
+
+# Modules whose import cost shows up in cold starts (Streamlit itself is loaded by the server)
+HEAVY_MODULES = ["numpy", "pandas", "pyarrow", "altair", "plotly.graph_objects"]
+
+
+def synthetic_tracts(rows, seed=0, template=TEMPLATE_CSV):
+    """``rows`` tracts with the template CSV's schema, resampled with replacement.
+
+    Census tract codes are renumbered so they stay unique (state + county +
+    6-digit sequence) and still carry the right county FIPS.
+    """
+    import numpy as np
+    import pandas as pd
+
+    base = pd.read_csv(template, na_values=["NULL"])
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+
+    for col in JITTER_COLUMNS:
+        df[col] = (df[col] * rng.uniform(0.9, 1.1, rows)).round(2)
+    county_fips = df["CensusTract"] // 1_000_000
+    sequence = df.groupby(county_fips).cumcount()
+    df["CensusTract"] = county_fips * 1_000_000 + sequence
+    return df
+
+
+def synthetic_csv(rows, seed=0, out_dir=BENCH_DIR):
+    """Path of a synthetic CSV with ``rows`` tracts, generated on first use."""
+    out_dir = Path(out_dir)
+    path = out_dir / f"synthetic_{rows}_{seed}.csv"
+    if not path.exists():
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".csv.tmp")
+        synthetic_tracts(rows, seed).to_csv(tmp, index=False, na_rep="NULL")
+        os.replace(tmp, path)
+    return path
+
+
+# --- worker: runs inside a fresh process whose env points the app at one dataset ---
+
+_section_seconds = collections.defaultdict(float)
+
+
+def _time_fragments():
+    # Time each @st.fragment section of the app; the script re-imports streamlit
+    # on every run, so wrapping the decorator here covers all of them
+    import streamlit as st
+
+    fragment = st.fragment
+
+    def timed_fragment(func=None, **kwargs):
+        if func is None:
+            return lambda f: timed_fragment(f, **kwargs)
+        wrapped = fragment(func, **kwargs)
+
+        @functools.wraps(func)
+        def run(*args, **kw):
+            start = time.perf_counter()
+            try:
+                return wrapped(*args, **kw)
+            finally:
+                _section_seconds[func.__name__] += time.perf_counter() - start
+        return run
+
+    st.fragment = timed_fragment
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def _widget(elements, label):
+    return next(w for w in elements if w.label == label)
+
+
+def _measure(at, step):
+    _section_seconds.clear()
+    start = time.perf_counter()
+    at.run()
+    wall = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+
+    sections = dict(_section_seconds)
+    sections["page"] = wall - sum(sections.values())
+    payloads = [{"type": kind, "bytes": len(el.proto.SerializeToString())}
+                for kind in CHART_ELEMENTS for el in at.get(kind)]
+    return {
+        "step": step,
+        "wall_s": round(wall, 4),
+        "sections_s": {name: round(seconds, 4) for name, seconds in sections.items()},
+        "peak_rss_mb": _peak_rss_mb(),
+        "charts": payloads,
+        "chart_bytes": sum(p["bytes"] for p in payloads),
+    }
+
+
+def run_scenario(timeout=600):
+    """One simulated session: every sidebar interaction and view in turn."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP), default_timeout=timeout)
+    # The map is built lazily; open its expander so every step renders and measures it
+    at.session_state["map_open"] = True
+    steps = [_measure(at, "initial")]
+
+    county = _widget(at.sidebar.selectbox, "County")
+    county.select(county.options[1])
+    steps.append(_measure(at, "county"))
+
+    compare = _widget(at.sidebar.multiselect, "Compare with Other Counties")
+    for option in compare.options[2:4]:
+        compare.select(option)
+    steps.append(_measure(at, "compare"))
+
+    _widget(at.sidebar.checkbox, "Urban Tracts Only").check()
+    steps.append(_measure(at, "urban"))
+
+    income = _widget(at.sidebar.slider, "Median Income Range")
+    low, high = income.min, income.max
+    span = high - low
+    income.set_range(low + span // 4, high - span // 4)
+    steps.append(_measure(at, "income"))
+
+    view = _widget(at.selectbox, "Select view:")
+    for option in view.options[1:] + view.options[:1]:
+        _widget(at.selectbox, "Select view:").select(option)
+        steps.append(_measure(at, f"view:{option}"))
+    return steps
+
+
+def _loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def startup_worker(out_path):
+    """First page load of a cold process: time to first element and to the full page."""
+    from streamlit.delta_generator import DeltaGenerator
+    from streamlit.testing.v1 import AppTest
+
+    first_paint = []
+    enqueue = DeltaGenerator._enqueue
+
+    def timed_enqueue(self, *args, **kwargs):
+        if not first_paint:
+            first_paint.append((time.perf_counter(), _loaded_heavy_modules()))
+        return enqueue(self, *args, **kwargs)
+
+    DeltaGenerator._enqueue = timed_enqueue
+    at = AppTest.from_file(str(APP), default_timeout=600)
+    start = time.perf_counter()
+    at.run()
+    page = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"startup: {at.exception[0].message}")
+    painted, loaded = first_paint[0]
+    with open(out_path, "w") as fh:
+        json.dump({
+            "first_paint_s": round(painted - start, 4),
+            "page_s": round(page, 4),
+            "loaded_at_first_paint": loaded,
+            "loaded_after_page": _loaded_heavy_modules(),
+        }, fh)
+
+
+def _import_seconds(importtime_log):
+    """Cumulative import time of each heavy module from ``-X importtime`` output."""
+    seconds = {}
+    for line in importtime_log.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3:
+            continue
+        name = parts[2].strip()
+        if name in HEAVY_MODULES and parts[1].strip().isdigit():
+            seconds[name] = int(parts[1]) / 1e6
+    return seconds
+
+
+def worker(out_path, repeat, precompute_first):
+    _time_fragments()
+    if precompute_first:
+        import precompute
+        precompute.run()
+    # Iteration 0 starts with empty caches; later ones replay the same filter states warm
+    iterations = [{"iteration": i, "steps": run_scenario()} for i in range(repeat)]
+    with open(out_path, "w") as fh:
+        json.dump(iterations, fh)
+
+
+# --- driver ---
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _package_versions():
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = {}
+    for name in ["streamlit", "pandas", "numpy", "pyarrow", "altair", "plotly"]:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def _dataset_env(source, work):
+    return dict(
+        os.environ,
+        FOOD_ACCESS_CSV=str(Path(source).resolve()),
+        FOOD_ACCESS_SNAPSHOT_DIR=str(work / "snapshots"),
+        FOOD_ACCESS_PARTITION_DIR=str(work / "partitions"),
+        FOOD_ACCESS_ARTIFACT_DIR=str(work / "artifacts"),
+        # A background warm-up would compete with the measured reruns and add to their RSS
+        FOOD_ACCESS_WARMUP="0",
+        STREAMLIT_LOGGER_LEVEL=os.environ.get("STREAMLIT_LOGGER_LEVEL", "error"),
+    )
+
+
+def benchmark_dataset(source, repeat, precompute_first):
+    with tempfile.TemporaryDirectory(prefix="food-access-bench-") as work:
+        work = Path(work)
+        env = _dataset_env(source, work)
+        out_path = work / "result.json"
+        cmd = [sys.executable, str(Path(__file__).resolve()), "--worker", str(out_path), "--repeat", str(repeat)]
+        if precompute_first:
+            cmd.append("--precompute")
+        subprocess.run(cmd, env=env, cwd=ROOT, check=True)
+        with open(out_path) as fh:
+            return json.load(fh)
+
+
+def benchmark_startup(source, runs, precompute_first):
+    with tempfile.TemporaryDirectory(prefix="food-access-bench-") as work:
+        work = Path(work)
+        env = _dataset_env(source, work)
+        # Data is prepared up front, as on a deployed container; only the page load is cold
+        subprocess.run([sys.executable, "partition_store.py", env["FOOD_ACCESS_CSV"]], env=env, cwd=ROOT,
+                       check=True, capture_output=True)
+        if precompute_first:
+            subprocess.run([sys.executable, "precompute.py"], env=env, cwd=ROOT, check=True, capture_output=True)
+
+        results = []
+        out_path = work / "startup.json"
+        for _ in range(runs):
+            cmd = [sys.executable, "-X", "importtime", str(Path(__file__).resolve()), "--startup-worker", str(out_path)]
+            proc = subprocess.run(cmd, env=env, cwd=ROOT, check=True, capture_output=True, text=True)
+            with open(out_path) as fh:
+                result = json.load(fh)
+            result["import_s"] = _import_seconds(proc.stderr)
+            results.append(result)
+        return results
+
+
+def print_startup_summary(run):
+    print(f"\n{run['source']} ({run['rows']:,} rows), cold starts")
+    for i, result in enumerate(run["startup"]):
+        imports = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in result["import_s"].items())
+        print(f"  [{i}] first paint {result['first_paint_s'] * 1000:6.0f}ms  page {result['page_s'] * 1000:6.0f}ms"
+              f"  loaded at first paint: {', '.join(result['loaded_at_first_paint']) or '-'}  ({imports})")
+
+
+def print_summary(run):
+    print(f"\n{run['source']} ({run['rows']:,} rows)")
+    for iteration in run["iterations"]:
+        for step in iteration["steps"]:
+            sections = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in step["sections_s"].items())
+            print(f"  [{iteration['iteration']}] {step['step']:<40} {step['wall_s'] * 1000:8.0f}ms"
+                  f" {step['peak_rss_mb']:8.1f}MB {step['chart_bytes']:>10,}B  ({sections})")
+
+
+def main(args):
+    datasets = [(Path(csv), None) for csv in args.csv]
+    datasets += [(synthetic_csv(rows, args.seed), rows) for rows in args.rows]
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": _package_versions(),
+        "mode": "startup" if args.startup else "session",
+        "repeat": args.startup or args.repeat,
+        "precomputed": args.precompute,
+        "runs": [],
+    }
+    for source, rows in datasets:
+        if rows is None:
+            rows = sum(1 for _ in open(source, "rb")) - 1
+        run = {"source": str(source), "rows": rows}
+        if args.startup:
+            run["startup"] = benchmark_startup(source, args.startup, args.precompute)
+            print_startup_summary(run)
+        else:
+            run["iterations"] = benchmark_dataset(source, args.repeat, args.precompute)
+            print_summary(run)
+        results["runs"].append(run)
+
+    with open(args.out, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dashboard reruns headlessly with Streamlit's AppTest.")
+    parser.add_argument("--rows", type=int, nargs="*", default=DEFAULT_ROWS,
+                        help="synthetic dataset sizes (default: 10000 72000 1000000)")
+    parser.add_argument("--csv", nargs="*", default=[], help="also benchmark these Atlas CSV files as-is")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+    parser.add_argument("--repeat", type=int, default=2, help="sessions per dataset; the first runs with cold caches")
+    parser.add_argument("--startup", type=int, metavar="N", help="measure N cold first page loads per dataset instead")
+    parser.add_argument("--precompute", action="store_true", help="run precompute.py before the sessions")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--startup-worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.startup_worker:
+        startup_worker(args.startup_worker)
+    elif args.worker:
+        worker(args.worker, args.repeat, args.precompute)
+    else:
+        main(args)
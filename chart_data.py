@@ -0,0 +1,103 @@
+"""Datasets handed to the charts.
+
+Charts only get the columns they encode, and aggregate encodings are
+evaluated here in pandas so the browser receives one row per bar instead of
+every tract.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# Above this many tracts the income/poverty scatter switches to population-weighted bins
+SCATTER_POINT_THRESHOLD = int(os.environ.get("FOOD_ACCESS_SCATTER_MAX_POINTS", "5000"))
+SCATTER_BINS = int(os.environ.get("FOOD_ACCESS_SCATTER_BINS", "40"))
+
+# Set FOOD_ACCESS_CLIENT_AGGREGATION=1 to ship tract rows and let Vega-Lite aggregate
+SERVER_SIDE_AGGREGATION = os.environ.get("FOOD_ACCESS_CLIENT_AGGREGATION", "0") != "1"
+
+SCATTER_COLUMNS = ["CensusTract", "County", "Pop2010", "PovertyRate", "MedianFamilyIncome"]
+VEHICLE_COLUMNS = ["County", "Pct_Households_No_Vehicle"]
+TOP_TRACT_COLUMNS = ["CensusTract", "County"]
+
+
+def chart_columns(df, columns):
+    return df[columns]
+
+
+def vehicle_by_county(filtered):
+    """Mean % of households without a vehicle per county, one row per county."""
+    if not SERVER_SIDE_AGGREGATION:
+        return chart_columns(filtered, VEHICLE_COLUMNS)
+    summary = filtered.groupby("County", as_index=False, observed=True)["Pct_Households_No_Vehicle"].mean()
+    summary["County"] = summary["County"].astype(str)
+    return summary
+
+
+def vehicle_field():
+    # Encoding field for the vehicle bars, matching whichever rows vehicle_by_county returned
+    if SERVER_SIDE_AGGREGATION:
+        return "Pct_Households_No_Vehicle"
+    return "mean(Pct_Households_No_Vehicle)"
+
+
+def use_binned_scatter(filtered):
+    return len(filtered) > SCATTER_POINT_THRESHOLD
+
+
+def _bin_edges(values, bins):
+    lo, hi = float(values.min()), float(values.max())
+    if hi <= lo:
+        hi = lo + 1.0
+    return np.linspace(lo, hi, bins + 1)
+
+
+def _bin_cells(ix, iy, pop, bins):
+    cell = ix.astype(np.int64) * bins + iy
+    occupied, inverse = np.unique(cell, return_inverse=True)
+    bx, by = np.divmod(occupied, bins)
+    return bx, by, np.bincount(inverse, weights=pop), np.bincount(inverse)
+
+
+def scatter_bins(filtered, bins=SCATTER_BINS, highlight="All"):
+    """Population-weighted 2-D histogram of income vs poverty over every county.
+
+    Each cell totals all counties in the selection (``Selected`` False). When
+    ``highlight`` names a county and other counties are selected too, that
+    county's own cells follow as ``Selected`` rows, drawn as an overlay.
+    """
+    income = filtered["MedianFamilyIncome"].to_numpy(dtype="float64", na_value=np.nan)
+    poverty = filtered["PovertyRate"].to_numpy(dtype="float64", na_value=np.nan)
+    pop = filtered["Pop2010"].to_numpy(dtype="float64", na_value=0)
+    counties = filtered["County"].astype(str).to_numpy()
+
+    valid = ~(np.isnan(income) | np.isnan(poverty))
+    income, poverty, pop, counties = income[valid], poverty[valid], pop[valid], counties[valid]
+    if len(income) == 0:
+        return pd.DataFrame(columns=["County", "income_lo", "income_hi", "poverty_lo", "poverty_hi",
+                                     "Pop2010", "Tracts", "Selected"])
+
+    x_edges = _bin_edges(income, bins)
+    y_edges = _bin_edges(poverty, bins)
+    ix = np.clip(np.searchsorted(x_edges, income, side="right") - 1, 0, bins - 1)
+    iy = np.clip(np.searchsorted(y_edges, poverty, side="right") - 1, 0, bins - 1)
+
+    layers = [("All counties", np.ones(len(ix), dtype=bool), False)]
+    in_county = counties == highlight
+    if highlight != "All" and in_county.any() and not in_county.all():
+        layers.append((highlight, in_county, True))
+
+    frames = []
+    for name, rows, selected in layers:
+        bx, by, weight, tracts = _bin_cells(ix[rows], iy[rows], pop[rows], bins)
+        frames.append(pd.DataFrame({
+            "County": name,
+            "income_lo": x_edges[bx],
+            "income_hi": x_edges[bx + 1],
+            "poverty_lo": y_edges[by],
+            "poverty_hi": y_edges[by + 1],
+            "Pop2010": weight,
+            "Tracts": tracts,
+            "Selected": selected,
+        }))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,225 @@
+"""Memoized Altair chart factory.
+
+Charts are described declaratively by a ``ChartSpec`` (kind, sort order,
+title, highlighted county, ...). ``vega_lite_spec`` builds the Altair chart
+for a description and caches the serialized Vega-Lite dict in a bounded LRU
+keyed on the data fingerprint plus the description, so repeated filter
+states skip rebuilding and re-serializing the Altair object graph. Altair
+itself is only imported on the first cache miss, not on page load.
+
+The cached spec carries no rows: the data goes to ``st.vega_lite_chart``
+separately, which sends it to the browser as Arrow. The spec therefore only
+depends on the data's schema, and that schema is what the fingerprint covers.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+COUNTY_SCHEME = "category20"
+CHART_CACHE_SIZE = 128
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    kind: str
+    title: str
+    sort: str = None
+    highlight_county: str = "All"
+    value_field: str = None
+    value_title: str = None
+
+
+# "Select view:" options for the top tracts chart -> (x sort, title, caption, paged).
+# Titles and captions are filled in with the number of tracts and the metric label.
+TOP_TRACT_VIEWS = {
+    "Top N Highest": (
+        "-x", "Top {n} Tracts with Highest {label}",
+        "Top {n} census tracts color-coded by county to show which counties have the highest {label_lower}.",
+        False),
+    "Highest to Lowest (All Tracts)": (
+        "-y", "Census Tracts Highest to Lowest by {label}",
+        "Every census tract in your selection ranked from highest to lowest {label_lower}, {n} per page.",
+        True),
+    "Lowest to Highest (Top N)": (
+        "y", "Top {n} Census Tracts Lowest to Highest {label}",
+        "Top {n} census tracts ranked from lowest to highest {label_lower}.",
+        False),
+}
+
+
+# Bound on first use by _load_altair(); importing Altair costs a few hundred ms
+alt = None
+
+
+def _load_altair():
+    global alt
+    if alt is None:
+        import altair
+        alt = altair
+
+
+def data_fingerprint(df):
+    schema = ",".join(f"{name}:{dtype}" for name, dtype in df.dtypes.items())
+    return hashlib.blake2b(schema.encode(), digest_size=16).hexdigest()
+
+
+def _county_selection():
+    # Shared selection - responds to both point hover and legend clicks
+    return alt.selection_point(fields=["County"], bind="legend", on="mouseover")
+
+
+def _selectable_county_color(selection):
+    return alt.condition(
+        selection,
+        "County:N",
+        alt.value("lightgray"),
+        title="County",
+        scale=alt.Scale(scheme=COUNTY_SCHEME),
+    )
+
+
+def _stroke_encoding(selected_county):
+    if selected_county != "All":
+        return alt.condition(alt.datum.County == selected_county, alt.value("black"), alt.value("transparent"))
+    return alt.value("transparent")
+
+
+def _stroke_width_encoding(selected_county):
+    if selected_county != "All":
+        return alt.condition(alt.datum.County == selected_county, alt.value(3), alt.value(0))
+    return alt.value(0)
+
+
+def _scatter(spec, data):
+    selection = _county_selection()
+    return alt.Chart(data).mark_circle(opacity=0.7).encode(
+        x=alt.X("MedianFamilyIncome:Q", title="Median Family Income"),
+        y=alt.Y("PovertyRate:Q", title="Poverty Rate (%)"),
+        size=alt.Size("Pop2010:Q", title="Population", scale=alt.Scale(range=[0, 120])),
+        color=_selectable_county_color(selection),
+        tooltip=[
+            alt.Tooltip("CensusTract:N", title="Census Tract"),
+            alt.Tooltip("County:N", title="County"),
+            alt.Tooltip("Pop2010:Q", title="Population", format=",.0f"),
+            alt.Tooltip("PovertyRate:Q", title="Poverty Rate (%)", format=".2f"),
+            alt.Tooltip("MedianFamilyIncome:Q", title="Median Family Income", format="$.2f"),
+        ],
+    ).properties(title=spec.title, width=600, height=430).add_params(selection).interactive()
+
+
+def _scatter_bins(spec, data):
+    # Level-of-detail mode: one rect per income/poverty cell, shaded by the population of
+    # every county in it, with the selected county's own cells outlined on top
+    base = alt.Chart().encode(
+        x=alt.X("income_lo:Q", title="Median Family Income"),
+        x2="income_hi:Q",
+        y=alt.Y("poverty_lo:Q", title="Poverty Rate (%)"),
+        y2="poverty_hi:Q",
+        tooltip=[
+            alt.Tooltip("County:N", title="County"),
+            alt.Tooltip("Tracts:Q", title="Census Tracts", format=",.0f"),
+            alt.Tooltip("Pop2010:Q", title="Population", format=",.0f"),
+            alt.Tooltip("income_lo:Q", title="Income From", format="$,.0f"),
+            alt.Tooltip("income_hi:Q", title="Income To", format="$,.0f"),
+            alt.Tooltip("poverty_lo:Q", title="Poverty Rate From (%)", format=".2f"),
+            alt.Tooltip("poverty_hi:Q", title="Poverty Rate To (%)", format=".2f"),
+        ],
+    )
+    totals = base.transform_filter("!datum.Selected").mark_rect().encode(
+        color=alt.Color("Pop2010:Q", title="Population", scale=alt.Scale(scheme="blues", type="sqrt")))
+    selected = base.transform_filter("datum.Selected").mark_rect(fill=None, stroke="black", strokeWidth=1.5)
+    return alt.layer(totals, selected, data=data).properties(title=spec.title, width=600, height=430).interactive()
+
+
+def _vehicle_bars(spec, data):
+    selection = _county_selection()
+    return alt.Chart(data).mark_bar().encode(
+        x=alt.X(f"{spec.value_field}:Q", title="% Without Vehicle", scale=alt.Scale(domain=[0, 40])),
+        y=alt.Y("County:N", sort="-x", title="County"),
+        color=_selectable_county_color(selection),
+        tooltip=[alt.Tooltip(f"{spec.value_field}:Q", title="% Without Vehicle", format=".2f")],
+    ).properties(title=spec.title, width=600, height=430).add_params(selection)
+
+
+def _top_tracts(spec, data):
+    return alt.Chart(data).mark_bar().encode(
+        x=alt.X("CensusTract:N", sort=spec.sort, title="Census Tract", axis=alt.Axis(labelAngle=0)),
+        y=alt.Y(f"{spec.value_field}:Q", title=spec.value_title),
+        color=alt.Color("County:N", scale=alt.Scale(scheme=COUNTY_SCHEME), title="County"),
+        # Full opacity everywhere - the selected county is highlighted with a stroke
+        opacity=alt.value(1.0),
+        stroke=_stroke_encoding(spec.highlight_county),
+        strokeWidth=_stroke_width_encoding(spec.highlight_county),
+        tooltip=[
+            alt.Tooltip("County:N", title="County"),
+            alt.Tooltip("CensusTract:N", title="Census Tract"),
+            alt.Tooltip(f"{spec.value_field}:Q", title=spec.value_title, format=",.2f"),
+        ],
+    ).properties(width=700, height=400, title=spec.title)
+
+
+def _county_change(spec, data):
+    return alt.Chart(data).mark_bar().encode(
+        x=alt.X("Change:Q", title=spec.value_title),
+        y=alt.Y("County:N", sort="-x", title="County"),
+        # Increases and decreases in two colors; whether that is better or worse depends on the metric
+        color=alt.condition(alt.datum.Change > 0, alt.value("#c0392b"), alt.value("#2e86c1")),
+        stroke=_stroke_encoding(spec.highlight_county),
+        strokeWidth=_stroke_width_encoding(spec.highlight_county),
+        tooltip=[
+            alt.Tooltip("County:N", title="County"),
+            alt.Tooltip("Change:Q", title=spec.value_title, format=",.2f"),
+            alt.Tooltip("Tracts:Q", title="Tracts Compared"),
+        ],
+    ).properties(title=spec.title, width=600, height=430)
+
+
+BUILDERS = {
+    "scatter": _scatter,
+    "scatter_bins": _scatter_bins,
+    "vehicle_bars": _vehicle_bars,
+    "top_tracts": _top_tracts,
+    "county_change": _county_change,
+}
+
+
+class ChartCache:
+    """Bounded LRU of serialized Vega-Lite specs."""
+
+    def __init__(self, maxsize=CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, spec, data):
+        key = (data_fingerprint(data), spec)
+        with self._lock:
+            cached = self._specs.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._specs.move_to_end(key)
+                return cached
+        self.misses += 1
+        _load_altair()
+        vega = BUILDERS[spec.kind](spec, data.iloc[:0]).to_dict()
+        vega.pop("data", None)
+        vega.pop("datasets", None)
+        with self._lock:
+            self._specs[key] = vega
+            while len(self._specs) > self.maxsize:
+                self._specs.popitem(last=False)
+        return vega
+
+
+chart_cache = ChartCache()
+
+
+def vega_lite_spec(spec, data):
+    """Data-free Vega-Lite dict for ``spec`` over ``data``, reused across reruns and sessions.
+
+    Render with ``st.vega_lite_chart(data, spec)``.
+    """
+    return chart_cache.get(spec, data)
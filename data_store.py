@@ -0,0 +1,138 @@
+"""Typed binary snapshot of the Food Access Research Atlas CSV.
+
+The CSV is parsed once and written to a Parquet snapshot with compact dtypes
+(categorical ``County``/``State``, int8 ``LA*``/``LILA*`` flags, ``NULL`` as
+real NA) and the derived dashboard columns already computed. The snapshot is
+rebuilt only when the source CSV's mtime/size changes *and* its content hash
+no longer matches.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import analytics
+
+SOURCE_CSV = os.environ.get("FOOD_ACCESS_CSV", "Massachusetts Food Access Data - Sheet1.csv")
+SNAPSHOT_DIR = Path(os.environ.get("FOOD_ACCESS_SNAPSHOT_DIR", ".snapshots"))
+
+# Bump when the snapshot layout or derived columns change so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+CATEGORY_COLUMNS = ["State", "County"]
+
+# 0/1 indicator columns from the Atlas
+FLAG_COLUMNS = [
+    "Urban", "LowIncomeTracts",
+    "LILATracts_1And10", "LILATracts_1And20", "LILATracts_Vehicle",
+    "LA1and10", "LA1and20", "LATracts1", "LATracts10", "LATracts20", "LATractsVehicle_20",
+]
+
+# Whole-number counts that fit comfortably in a smaller integer type
+COUNT_COLUMNS = ["Pop2010", "OHU2010", "TractLOWI", "TractHUNV"]
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(source):
+    stem = Path(source).stem.replace(" ", "_")
+    return SNAPSHOT_DIR / f"{stem}.parquet", SNAPSHOT_DIR / f"{stem}.json"
+
+
+def source_version(source=SOURCE_CSV):
+    # Cheap identity of the source file, suitable as a cache key
+    stat = os.stat(source)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _downcast_int(series, nullable_dtype):
+    if series.isna().any():
+        return series.astype(nullable_dtype)
+    return pd.to_numeric(series, downcast="integer")
+
+
+def parse_csv(source=SOURCE_CSV):
+    """Parse the raw Atlas CSV into the typed frame the dashboard uses."""
+    df = pd.read_csv(source, na_values=["NULL"])
+
+    df["County"] = df["County"].str.replace(" County", "", regex=False)
+    for col in CATEGORY_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype("category")
+    for col in FLAG_COLUMNS:
+        if col in df:
+            df[col] = _downcast_int(df[col], "Int8")
+    for col in COUNT_COLUMNS:
+        if col in df:
+            df[col] = _downcast_int(df[col], "Int32")
+
+    # Derived columns, computed once here instead of on every rerun
+    df["CountyFIPS"] = (df["CensusTract"] // 1_000_000).astype(str).str.zfill(5).astype("category")
+    return analytics.add_derived_columns(df)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp = meta_path.with_name(f"{meta_path.name}.tmp-{os.getpid()}")
+    with open(tmp, "w") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, meta_path)
+
+
+def _snapshot_is_current(source, snapshot_path, meta_path):
+    meta = _read_meta(meta_path)
+    if not meta or meta.get("version") != SNAPSHOT_VERSION or not snapshot_path.exists():
+        return False
+    stat = os.stat(source)
+    if meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size:
+        return True
+    # mtime moved (checkout, copy, touch) - only rebuild if the content really changed
+    if meta.get("sha256") == _file_hash(source):
+        meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        _write_meta(meta_path, meta)
+        return True
+    return False
+
+
+def build_snapshot(source=SOURCE_CSV):
+    """Parse ``source`` and (re)write its snapshot. Returns the typed frame."""
+    snapshot_path, meta_path = _snapshot_paths(source)
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    df = parse_csv(source)
+
+    tmp = snapshot_path.with_name(f"{snapshot_path.name}.tmp-{os.getpid()}")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, snapshot_path)
+
+    stat = os.stat(source)
+    _write_meta(meta_path, {
+        "version": SNAPSHOT_VERSION,
+        "source": str(source),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": _file_hash(source),
+    })
+    return df
+
+
+def load_tracts(source=SOURCE_CSV):
+    """Return the typed tract table, reading the snapshot when it is current."""
+    snapshot_path, meta_path = _snapshot_paths(source)
+    if _snapshot_is_current(source, snapshot_path, meta_path):
+        return pd.read_parquet(snapshot_path)
+    return build_snapshot(source)
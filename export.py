@@ -0,0 +1,136 @@
+"""Chunked exports of a filtered tract selection and its county summary.
+
+Exports are written straight from the selected row positions to a file, one
+chunk of rows at a time, so a national-scale selection never needs a second
+full copy of the frame or one big in-memory string. Files are cached on disk
+under the data version, filter state and format, so downloading the same
+selection again only reads the finished file back.
+
+The default export directory is inside the app's ``static/`` folder. With
+Streamlit's static file serving on (``.streamlit/config.toml``), a finished
+file is downloaded straight from disk through ``static_url``, so the worker
+never holds it in memory.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Served by Streamlit at app/static/ when server.enableStaticServing is on
+STATIC_DIR = Path(__file__).parent / "static"
+EXPORT_DIR = Path(os.environ.get("FOOD_ACCESS_EXPORT_DIR", STATIC_DIR / "exports"))
+CHUNK_ROWS = int(os.environ.get("FOOD_ACCESS_EXPORT_CHUNK_ROWS", "50000"))
+
+# Cached export files kept on disk; the least recently used beyond this are removed
+MAX_FILES = 64
+
+# Streamlit's static file route refuses files larger than this
+STATIC_MAX_BYTES = 200 * 1024 * 1024
+
+# Format label -> (file extension, MIME type)
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "GeoJSON": (".geojson", "application/geo+json"),
+}
+
+
+def _chunks(df, rows, chunk_rows=CHUNK_ROWS):
+    if rows is None:
+        rows = np.arange(len(df))
+    if len(rows) == 0:
+        yield df.iloc[:0]
+        return
+    for start in range(0, len(rows), chunk_rows):
+        yield df.take(rows[start:start + chunk_rows])
+
+
+def _write_csv(chunks, fh, ids=None, geometry=None):
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(fh, header=header, index=False)
+        header = False
+
+
+def _write_parquet(chunks, fh, ids=None, geometry=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    for chunk in chunks:
+        # One row group per chunk
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(fh, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+
+def _write_geojson(chunks, fh, ids=None, geometry=None):
+    # Features without a known shape get a null geometry, which GeoJSON allows
+    geometry = geometry or {}
+    fh.write('{"type":"FeatureCollection","features":[')
+    first = True
+    for chunk in chunks:
+        # to_json turns NaN/NA into null and numpy scalars into plain numbers
+        properties = json.loads(chunk.to_json(orient="records"))
+        for feature_id, props in zip(ids(chunk), properties):
+            if not first:
+                fh.write(",")
+            first = False
+            fh.write(json.dumps({"type": "Feature", "id": feature_id, "properties": props,
+                                 "geometry": geometry.get(feature_id)}, separators=(",", ":")))
+    fh.write("]}")
+
+
+WRITERS = {
+    "CSV": (_write_csv, "w"),
+    "Parquet": (_write_parquet, "wb"),
+    "GeoJSON": (_write_geojson, "w"),
+}
+
+
+def export_path(name, key, fmt):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return EXPORT_DIR / f"{name}-{digest}{FORMATS[fmt][0]}"
+
+
+def static_url(path):
+    """App-relative URL Streamlit serves ``path`` from, or None if it can't be served statically."""
+    try:
+        relative = Path(path).resolve().relative_to(STATIC_DIR.resolve())
+    except ValueError:
+        return None
+    if not path.exists() or path.stat().st_size > STATIC_MAX_BYTES:
+        return None
+    return f"app/static/{relative.as_posix()}"
+
+
+def _prune(max_files=MAX_FILES):
+    files = sorted((p for p in EXPORT_DIR.iterdir() if p.suffix in {ext for ext, _ in FORMATS.values()}),
+                   key=lambda p: p.stat().st_mtime)
+    for path in files[:max(0, len(files) - max_files)]:
+        path.unlink(missing_ok=True)
+
+
+def export_file(name, key, fmt, df, rows=None, ids=None, geometry=None):
+    """Path of ``df`` (only ``rows`` of it, if given) exported as ``fmt``, written on first request.
+
+    ``key`` identifies the selection (data version plus filter state). For
+    GeoJSON, ``ids(chunk)`` gives each row's feature id and ``geometry`` maps
+    ids to GeoJSON geometries.
+    """
+    path = export_path(name, key, fmt)
+    if path.exists():
+        path.touch()
+        return path
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    write, mode = WRITERS[fmt]
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    with open(tmp, mode, **({"newline": "", "encoding": "utf-8"} if mode == "w" else {})) as fh:
+        write(_chunks(df, rows), fh, ids, geometry)
+    os.replace(tmp, path)
+    _prune()
+    return path
@@ -0,0 +1,108 @@
+"""Precomputed index for the sidebar filters.
+
+Built once per dataset: county -> row positions, the urban mask and a
+``MedianFamilyIncome``-sorted permutation, so a filter state resolves with a
+couple of ``searchsorted`` calls and small gathers instead of full-frame scans.
+Results are memoized on the filter key.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class FilterIndex:
+    def __init__(self, df, cache_size=256):
+        self.n_rows = len(df)
+
+        counties = df["County"].astype("category")
+        codes = counties.cat.codes.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(counties.cat.categories) + 1))
+        self._county_rows = {
+            name: order[bounds[i]:bounds[i + 1]]
+            for i, name in enumerate(counties.cat.categories)
+        }
+
+        self._urban = (df["Urban"] == 1).to_numpy(dtype=bool, na_value=False)
+
+        # Tracts without an income never pass the income filter, so they are left
+        # out of the permutation and get rank -1
+        income = df["MedianFamilyIncome"].to_numpy(dtype="float64", na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(income))
+        self._income_order = valid[np.argsort(income[valid], kind="stable")]
+        self._income_sorted = income[self._income_order]
+        self._income_rank = np.full(self.n_rows, -1, dtype=np.int64)
+        self._income_rank[self._income_order] = np.arange(len(self._income_order))
+        self._income_valid = valid
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(selected_county, selected_counties, urban_only, income_range):
+        return (selected_county, tuple(selected_counties), bool(urban_only),
+                (income_range[0], income_range[1]))
+
+    def _county_positions(self, selected_county, selected_counties):
+        if selected_county != "All":
+            names = [selected_county] + list(selected_counties)
+        elif selected_counties:
+            names = list(selected_counties)
+        else:
+            return None
+        parts = [self._county_rows[n] for n in dict.fromkeys(names) if n in self._county_rows]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def _compute(self, selected_county, selected_counties, urban_only, income_range):
+        lo = np.searchsorted(self._income_sorted, income_range[0], side="left")
+        hi = np.searchsorted(self._income_sorted, income_range[1], side="right")
+
+        rows = self._county_positions(selected_county, selected_counties)
+        if rows is not None:
+            rank = self._income_rank[rows]
+            rows = rows[(rank >= lo) & (rank < hi)]
+        elif lo == 0 and hi == len(self._income_order):
+            rows = self._income_valid
+        else:
+            rows = np.sort(self._income_order[lo:hi])
+
+        if urban_only:
+            rows = rows[self._urban[rows]]
+        rows = np.ascontiguousarray(rows, dtype=np.int64)
+        rows.setflags(write=False)
+        return rows
+
+    def select(self, selected_county, selected_counties, urban_only, income_range):
+        """Row positions (ascending) matching the sidebar filter state."""
+        key = self.key(selected_county, selected_counties, urban_only, income_range)
+        with self._lock:
+            rows = self._cache.get(key)
+            if rows is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return rows
+        self.misses += 1
+        rows = self._compute(*key)
+        with self._lock:
+            self._cache[key] = rows
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    def take(self, df, rows, columns=None):
+        """The selected rows of ``df``, limited to ``columns`` if given.
+
+        Only the requested columns are gathered, and nothing is copied when no
+        row is filtered out.
+        """
+        if columns is not None:
+            df = df[columns]
+        if len(rows) == self.n_rows:
+            return df
+        return df.take(rows)
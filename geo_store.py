@@ -0,0 +1,280 @@
+"""Local, pre-simplified county and tract geometry for the choropleths.
+
+The nationwide ``geojson-counties-fips.json`` is only needed at build time:
+
+    python geo_store.py --state 25 --tolerance 0.001
+
+extracts one state's county features, optionally simplifies them and writes
+``data/geo/counties_<state fips>.geojson``. The app then loads that file
+through a process-wide cache, so reruns never touch the network.
+
+Tract shapes come from a local Census tract file (GeoJSON, or a 2010 TIGER /
+cartographic boundary shapefile or its .zip with ``pyshp`` installed):
+
+    python geo_store.py --state 25 --tracts --source gz_2010_25_140_00_500k.zip
+
+writes one ``tracts_<state fips>_<level>.geojson`` per zoom level in
+``TRACT_LEVELS``, each simplified for how far the map is zoomed in. Features
+are keyed by the 11-digit tract GEOID. The same build writes each tract's
+centroid, from the unsimplified shape, to ``tract_centroids_<state fips>.json``
+for proximity queries.
+"""
+import argparse
+import json
+import os
+import urllib.request
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+COUNTY_SOURCE_URL = "https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json"
+GEO_DIR = Path(os.environ.get("FOOD_ACCESS_GEO_DIR", Path(__file__).parent / "data" / "geo"))
+
+# Tract zoom level -> Douglas-Peucker tolerance in degrees. "state" is used for a
+# whole-state view, "county" once the map is zoomed in on a county.
+TRACT_LEVELS = {"state": 0.002, "county": 0.0003}
+
+
+def county_geometry_path(state_fips):
+    return GEO_DIR / f"counties_{state_fips}.geojson"
+
+
+def tract_geometry_path(state_fips, level):
+    return GEO_DIR / f"tracts_{state_fips}_{level}.geojson"
+
+
+def tract_centroids_path(state_fips):
+    return GEO_DIR / f"tract_centroids_{state_fips}.json"
+
+
+def _read_geojson(source):
+    if str(source).lower().endswith((".shp", ".zip")):
+        # Census distributes tract boundaries as shapefiles; pyshp is only needed to build
+        try:
+            import shapefile
+        except ImportError:
+            raise SystemExit("Reading shapefiles needs pyshp (pip install pyshp), or convert the file to GeoJSON.")
+        with shapefile.Reader(str(source)) as reader:
+            return reader.__geo_interface__
+    if str(source).startswith(("http://", "https://")):
+        with urllib.request.urlopen(source) as resp:
+            return json.load(resp)
+    with open(source) as fh:
+        return json.load(fh)
+
+
+def _simplify_line(points, tolerance):
+    # Iterative Douglas-Peucker; always keeps the two end points
+    if tolerance <= 0 or len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        seg = b - a
+        inner = points[start + 1:end]
+        seg_len = np.hypot(*seg)
+        if seg_len == 0:
+            dist = np.hypot(*(inner - a).T)
+        else:
+            dist = np.abs(seg[0] * (inner[:, 1] - a[1]) - seg[1] * (inner[:, 0] - a[0])) / seg_len
+        idx = int(np.argmax(dist))
+        if dist[idx] > tolerance:
+            mid = start + 1 + idx
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    return points[keep]
+
+
+def _simplify_ring(ring, tolerance, precision):
+    points = np.asarray(ring, dtype=float)
+    simplified = _simplify_line(points, tolerance)
+    # A closed ring needs at least 4 positions; keep the original if we collapsed it
+    if len(simplified) < 4:
+        simplified = points
+    return np.round(simplified, precision).tolist()
+
+
+def simplify_geometry(geometry, tolerance, precision=5):
+    """Simplify a Polygon/MultiPolygon geometry with tolerance in degrees."""
+    if geometry["type"] == "Polygon":
+        coords = [_simplify_ring(ring, tolerance, precision) for ring in geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        coords = [[_simplify_ring(ring, tolerance, precision) for ring in polygon]
+                  for polygon in geometry["coordinates"]]
+    else:
+        return geometry
+    return {"type": geometry["type"], "coordinates": coords}
+
+
+def extract_state_features(geo_json, state_fips, tolerance=0.0, precision=5):
+    features = []
+    for feature in geo_json["features"]:
+        if not str(feature.get("id", "")).startswith(state_fips):
+            continue
+        features.append({
+            "type": "Feature",
+            "id": feature["id"],
+            "properties": feature.get("properties", {}),
+            "geometry": simplify_geometry(feature["geometry"], tolerance, precision),
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _tract_geoid(feature):
+    # 2010 cartographic boundary files carry GEO_ID ("1400000US25001010100"), TIGER files GEOID10
+    properties = feature.get("properties") or {}
+    for key in ["GEOID10", "GEOID", "GEO_ID"]:
+        if key in properties:
+            return str(properties[key])[-11:]
+    return str(feature.get("id", ""))
+
+
+def _ring_moments(ring):
+    x, y = np.asarray(ring, dtype="float64")[:, :2].T
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    return cross.sum() / 2, ((x[:-1] + x[1:]) * cross).sum() / 6, ((y[:-1] + y[1:]) * cross).sum() / 6
+
+
+def geometry_centroid(geometry):
+    """Area-weighted (lon, lat) centroid of a Polygon or MultiPolygon, holes subtracted."""
+    polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+    area = moment_x = moment_y = 0.0
+    for polygon in polygons:
+        for i, ring in enumerate(polygon):
+            ring_area, ring_x, ring_y = _ring_moments(ring)
+            # GeoJSON and shapefiles wind rings in opposite directions, so the first
+            # ring of each polygon is taken as exterior whatever its orientation
+            sign = np.sign(ring_area) * (1 if i == 0 else -1)
+            area += sign * ring_area
+            moment_x += sign * ring_x
+            moment_y += sign * ring_y
+    if area == 0:
+        points = np.concatenate([np.asarray(ring, dtype="float64")[:, :2] for polygon in polygons for ring in polygon])
+        return tuple(points.mean(axis=0))
+    return moment_x / area, moment_y / area
+
+
+def _write_geojson(collection, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(collection, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def build_county_geometry(state_fips, source=COUNTY_SOURCE_URL, tolerance=0.0, precision=5):
+    """Extract one state's counties from ``source`` and write them to the local store."""
+    collection = extract_state_features(_read_geojson(source), state_fips, tolerance, precision)
+    path = county_geometry_path(state_fips)
+    _write_geojson(collection, path)
+    load_county_geometry.cache_clear()
+    return path
+
+
+def build_tract_geometry(state_fips, source, levels=TRACT_LEVELS, precision=5):
+    """Write one simplified tract FeatureCollection per zoom level. Returns the paths."""
+    tracts = []
+    for feature in _read_geojson(source)["features"]:
+        geoid = _tract_geoid(feature)
+        if geoid.startswith(state_fips):
+            # Only the GEOID is kept; everything else the map shows comes from the data
+            tracts.append((geoid, feature["geometry"]))
+
+    paths = []
+    for level, tolerance in levels.items():
+        collection = {"type": "FeatureCollection", "features": [
+            {"type": "Feature", "id": geoid, "properties": {},
+             "geometry": simplify_geometry(geometry, tolerance, precision)}
+            for geoid, geometry in tracts]}
+        path = tract_geometry_path(state_fips, level)
+        _write_geojson(collection, path)
+        paths.append(path)
+
+    centroids = [geometry_centroid(geometry) for _, geometry in tracts]
+    path = tract_centroids_path(state_fips)
+    _write_geojson({
+        "GEOID": [geoid for geoid, _ in tracts],
+        "lon": [round(float(lon), precision + 1) for lon, _ in centroids],
+        "lat": [round(float(lat), precision + 1) for _, lat in centroids],
+    }, path)
+    paths.append(path)
+    load_tract_geometry.cache_clear()
+    tract_features.cache_clear()
+    load_tract_centroids.cache_clear()
+    return paths
+
+
+@lru_cache(maxsize=None)
+def load_county_geometry(state_fips):
+    """County FeatureCollection for ``state_fips`` (features keyed by ``id``)."""
+    with open(county_geometry_path(state_fips)) as fh:
+        return json.load(fh)
+
+
+def has_tract_geometry(state_fips):
+    return all(tract_geometry_path(state_fips, level).exists() for level in TRACT_LEVELS)
+
+
+@lru_cache(maxsize=None)
+def load_tract_geometry(state_fips, level):
+    """Tract FeatureCollection for ``state_fips`` at one zoom level (features keyed by GEOID)."""
+    with open(tract_geometry_path(state_fips, level)) as fh:
+        return json.load(fh)
+
+
+@lru_cache(maxsize=64)
+def tract_features(state_fips, level, counties=None):
+    """Tract FeatureCollection limited to ``counties`` (a tuple of 5-digit FIPS), or all tracts."""
+    collection = load_tract_geometry(state_fips, level)
+    if counties is None:
+        return collection
+    features = [f for f in collection["features"] if f["id"][:5] in counties]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def has_tract_centroids(state_fips):
+    return tract_centroids_path(state_fips).exists()
+
+
+@lru_cache(maxsize=None)
+def load_tract_centroids(state_fips):
+    """Tract centroids for ``state_fips`` as parallel ``GEOID``, ``lon`` and ``lat`` lists."""
+    with open(tract_centroids_path(state_fips)) as fh:
+        return json.load(fh)
+
+
+def county_fips(state_fips):
+    """County name -> 5-digit FIPS, read from the stored geometry."""
+    return {f["properties"]["NAME"]: f["id"] for f in load_county_geometry(state_fips)["features"]}
+
+
+def feature_by_fips(state_fips, fips):
+    return next((f for f in load_county_geometry(state_fips)["features"] if f["id"] == fips), None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local county or tract geometry store for one state.")
+    parser.add_argument("--state", default="25", help="two-digit state FIPS code (default: 25, Massachusetts)")
+    parser.add_argument("--source", help="nationwide county GeoJSON (URL or path; default: plotly's"
+                                         " geojson-counties-fips.json), or with --tracts a local tract file")
+    parser.add_argument("--tracts", action="store_true",
+                        help="build tract geometry (one file per zoom level) and centroids instead of counties")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Douglas-Peucker tolerance in degrees for counties; 0 keeps full detail")
+    parser.add_argument("--precision", type=int, default=5, help="decimal places kept in coordinates")
+    args = parser.parse_args()
+    if args.tracts:
+        if not args.source:
+            parser.error("--tracts needs --source (a GeoJSON or shapefile of the state's census tracts)")
+        for out in build_tract_geometry(args.state, args.source, precision=args.precision):
+            print(f"Wrote {out}")
+    else:
+        out = build_county_geometry(args.state, args.source or COUNTY_SOURCE_URL, args.tolerance, args.precision)
+        print(f"Wrote {out}")
@@ -0,0 +1,287 @@
+"""State-partitioned tract store, shared by every worker process.
+
+Each source CSV goes through the typed snapshot in ``data_store`` and is
+split into one partition per state. Per-partition aggregates are written
+alongside, so nationwide metrics never need the full table.
+
+Partitions are published as read-only, uncompressed Arrow IPC files in a
+versioned directory (``data/partitions/<version>/state=<fips>/tracts.arrow``)
+and the ``CURRENT`` file names the live version. Workers memory-map those
+files: DataFrame columns point straight into the mapping, so every process
+and session shares one copy of the data through the page cache. Publishing a
+new version swaps ``CURRENT`` atomically; running workers pick it up on their
+next rerun without a restart, while reruns already in flight keep the version
+they started with. Builds take a lock file, so when a source changes one
+worker rebuilds and the others wait for it and then serve its version.
+
+    python partition_store.py "Massachusetts Food Access Data - Sheet1.csv" atlas_2019.csv
+"""
+import argparse
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+import data_store
+
+PARTITION_DIR = Path(os.environ.get("FOOD_ACCESS_PARTITION_DIR", Path(__file__).parent / "data" / "partitions"))
+CURRENT = "CURRENT"
+MANIFEST = "manifest.json"
+AGGREGATES = "aggregates.arrow"
+BUILD_LOCK = ".build.lock"
+
+# Published versions kept on disk, including the live one; older ones are removed
+KEEP_VERSIONS = 2
+
+# Resident state partitions are evicted least-recently-used beyond this many megabytes
+STATE_CACHE_MB = int(os.environ.get("FOOD_ACCESS_STATE_CACHE_MB", "512"))
+
+
+def _partition_path(version, state_fips):
+    return PARTITION_DIR / version / f"state={state_fips}" / "tracts.arrow"
+
+
+def write_arrow(df, path):
+    """Write ``df`` as an uncompressed Arrow IPC file that maps back without copies."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Floats keep NaN in the data buffer instead of a validity bitmap; a bitmap would
+    # force pandas to copy the column when converting
+    for i, name in enumerate(table.column_names):
+        if df[name].dtype.kind == "f":
+            table = table.set_column(i, name, pa.array(df[name].to_numpy(), from_pandas=False))
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_arrow(path):
+    """Memory-map an Arrow file written by ``write_arrow`` as a read-only DataFrame."""
+    source = pa.memory_map(str(path), "r")
+    # split_blocks keeps one block per column so numeric columns stay views of the map
+    return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+
+def state_fips_of(df):
+    return df["CountyFIPS"].astype(str).str[:2]
+
+
+def partition_aggregates(state, state_fips, part):
+    # Sums and counts rather than means so partitions combine exactly
+    return {
+        "State": state,
+        "StateFIPS": state_fips,
+        "Tracts": len(part),
+        "Counties": part["CountyFIPS"].nunique(),
+        "LILATracts": int(part["LILATracts_1And10"].sum()),
+        "PovertySum": float(part["PovertyRate"].sum()),
+        "PovertyCount": int(part["PovertyRate"].count()),
+        "IncomeSum": float(part["MedianFamilyIncome"].sum()),
+        "IncomeCount": int(part["MedianFamilyIncome"].count()),
+    }
+
+
+def current_version():
+    try:
+        return (PARTITION_DIR / CURRENT).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def _publish(version):
+    tmp = PARTITION_DIR / f"{CURRENT}.tmp-{os.getpid()}"
+    tmp.write_text(version)
+    os.replace(tmp, PARTITION_DIR / CURRENT)
+
+
+@contextlib.contextmanager
+def build_lock():
+    """Exclusive lock held while a version is built and published, across processes."""
+    PARTITION_DIR.mkdir(parents=True, exist_ok=True)
+    with open(PARTITION_DIR / BUILD_LOCK, "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _sequence(name):
+    # Versions are "v<sequence>-<timestamp>"; anything else sorts first
+    try:
+        return int(name[1:].split("-")[0])
+    except ValueError:
+        return -1
+
+
+def _versions():
+    return sorted((p.name for p in PARTITION_DIR.glob("v*") if p.is_dir()), key=_sequence)
+
+
+def _next_version():
+    versions = _versions()
+    sequence = max(_sequence(versions[-1]), 0) + 1 if versions else 1
+    return f"v{sequence:06d}-{time.strftime('%Y%m%dT%H%M%S')}"
+
+
+def _prune(keep=KEEP_VERSIONS):
+    # Workers may still map files of an old version; on POSIX removing them only
+    # drops the names, the mapped data lives until the last worker lets go
+    live = current_version()
+    versions = [name for name in _versions() if name != live]
+    for name in versions[:max(0, len(versions) - (keep - 1))]:
+        shutil.rmtree(PARTITION_DIR / name, ignore_errors=True)
+
+
+def build_partitions(sources):
+    """Split every source CSV into per-state partitions, publish them and return the manifest.
+
+    Call it under ``build_lock()``.
+    """
+    frames = [data_store.load_tracts(source) for source in sources]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    for col in data_store.CATEGORY_COLUMNS + ["CountyFIPS"]:
+        df[col] = df[col].astype("category")
+
+    version = _next_version()
+    # Written under a staging name and renamed into place, so a version directory is always complete
+    staging = PARTITION_DIR / f".{version}.tmp"
+    aggregates = []
+    for state_fips, part in df.groupby(state_fips_of(df), observed=True, sort=True):
+        part = part.reset_index(drop=True)
+        for col in data_store.CATEGORY_COLUMNS + ["CountyFIPS"]:
+            part[col] = part[col].cat.remove_unused_categories()
+        path = staging / f"state={state_fips}" / "tracts.arrow"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_arrow(part, path)
+        aggregates.append(partition_aggregates(str(part["State"].iloc[0]), state_fips, part))
+
+    write_arrow(pd.DataFrame(aggregates), staging / AGGREGATES)
+    manifest = {"version": version, "sources": {str(s): data_store.source_version(s) for s in sources}}
+    with open(staging / MANIFEST, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(staging, PARTITION_DIR / version)
+    _publish(version)
+    _prune()
+    return manifest
+
+
+def read_manifest(version=None):
+    version = version or current_version()
+    if version is None:
+        return None
+    try:
+        with open(PARTITION_DIR / version / MANIFEST) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _stale_sources(manifest, default_sources, sources=None):
+    """Sources to rebuild from, or None when ``manifest`` is up to date."""
+    if sources is not None:
+        # Asked for these exact sources: rebuild unless the live version is them, unchanged
+        wanted = {str(s): data_store.source_version(s) for s in sources}
+        return None if manifest is not None and manifest["sources"] == wanted else list(sources)
+    if manifest is None:
+        return list(default_sources)
+    sources = manifest["sources"]
+    current = {s: data_store.source_version(s) for s in sources if os.path.exists(s)}
+    if current != sources:
+        return list(current) or list(default_sources)
+    return None
+
+
+def ensure_partitions(default_sources=(data_store.SOURCE_CSV,), sources=None):
+    """Build the store if it is missing or any recorded source changed.
+
+    With ``sources``, the store is (re)built from exactly those files unless
+    the live version already is. Returns the live version, which changes
+    whenever partitions are published.
+    """
+    manifest = read_manifest()
+    if _stale_sources(manifest, default_sources, sources) is not None:
+        with build_lock():
+            # Another worker may have published while this one waited for the lock
+            manifest = read_manifest()
+            stale = _stale_sources(manifest, default_sources, sources)
+            if stale is not None:
+                manifest = build_partitions(stale)
+    return manifest["version"]
+
+
+def read_aggregates(version=None):
+    return read_arrow(PARTITION_DIR / (version or current_version()) / AGGREGATES)
+
+
+def national_summary(aggregates):
+    """Tract count, % LILA, average poverty and income across all partitions."""
+    tracts = aggregates["Tracts"].sum()
+    return {
+        "total_tracts": int(tracts),
+        "percent_LILA": aggregates["LILATracts"].sum() / tracts * 100,
+        "avg_poverty": aggregates["PovertySum"].sum() / aggregates["PovertyCount"].sum(),
+        "avg_income": aggregates["IncomeSum"].sum() / aggregates["IncomeCount"].sum(),
+    }
+
+
+def county_fips(df):
+    """County name -> 5-digit FIPS for one state's partition."""
+    pairs = df[["County", "CountyFIPS"]].drop_duplicates()
+    return dict(zip(pairs["County"].astype(str), pairs["CountyFIPS"].astype(str)))
+
+
+class PartitionStore:
+    """Lazily mapped state partitions of one published version.
+
+    Mapped partitions live in the shared page cache rather than process memory;
+    the LRU bounds how much of it one process keeps mapped.
+    """
+
+    def __init__(self, version=None, cap_mb=STATE_CACHE_MB):
+        self.version = version or current_version()
+        self.cap_bytes = cap_mb * 1024 * 1024
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, state_fips):
+        with self._lock:
+            entry = self._resident.get(state_fips)
+            if entry is not None:
+                self.hits += 1
+                self._resident.move_to_end(state_fips)
+                return entry[0]
+        self.misses += 1
+        path = _partition_path(self.version, state_fips)
+        df = read_arrow(path)
+        size = path.stat().st_size
+        with self._lock:
+            self._resident[state_fips] = (df, size)
+            # Always keep the partition just requested, even if it alone exceeds the cap
+            while len(self._resident) > 1 and self.resident_bytes() > self.cap_bytes:
+                self._resident.popitem(last=False)
+        return df
+
+    def resident_bytes(self):
+        return sum(size for _, size in self._resident.values())
+
+    def resident_states(self):
+        return list(self._resident)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the state-partitioned tract store.")
+    parser.add_argument("sources", nargs="*", default=[data_store.SOURCE_CSV],
+                        help="Food Access Research Atlas CSV files (default: the bundled Massachusetts file)")
+    args = parser.parse_args()
+    with build_lock():
+        manifest = build_partitions(args.sources)
+    print(f"Published {len(read_aggregates())} state partitions as {PARTITION_DIR / manifest['version']}")
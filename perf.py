@@ -0,0 +1,230 @@
+"""Opt-in performance instrumentation for the dashboard.
+
+Enable with ``FOOD_ACCESS_PERF=1`` or the ``?perf=1`` query parameter. Every
+script run then records hot-path timers (data load, filtering, aggregation,
+chart construction, chart rendering), the payload size of each chart sent to
+the browser and the hit/miss counters of the in-process caches. The numbers
+are shown in a collapsible sidebar panel and exported:
+
+* ``FOOD_ACCESS_PERF_LOG`` (default ``perf/metrics.jsonl``): one JSON line per
+  run, rotated at ``FOOD_ACCESS_PERF_LOG_MB`` megabytes.
+* ``FOOD_ACCESS_PERF_PROM``: optional Prometheus text-format file with
+  process-wide totals, rewritten atomically after every run (point
+  node_exporter's textfile collector at it).
+
+When instrumentation is off every hook is a no-op.
+"""
+import contextlib
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+ENV_FLAG = "FOOD_ACCESS_PERF"
+QUERY_PARAM = "perf"
+
+LOG_PATH = Path(os.environ.get("FOOD_ACCESS_PERF_LOG", Path(__file__).parent / "perf" / "metrics.jsonl"))
+LOG_MAX_MB = float(os.environ.get("FOOD_ACCESS_PERF_LOG_MB", "10"))
+LOG_BACKUPS = 5
+PROM_PATH = os.environ.get("FOOD_ACCESS_PERF_PROM")
+
+
+def enabled():
+    if os.environ.get(ENV_FLAG, "0") == "1":
+        return True
+    return st.query_params.get(QUERY_PARAM) == "1"
+
+
+def arrow_bytes(df):
+    """Size of ``df`` as an Arrow IPC stream, which is how Streamlit ships chart data."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df)
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.size()
+
+
+def vega_payload_bytes(data, spec):
+    return arrow_bytes(data) + len(json.dumps(spec))
+
+
+def plotly_payload_bytes(fig):
+    return len(fig.to_json())
+
+
+class Recorder:
+    """Timers, payload sizes and cache counters for one script run."""
+
+    def __init__(self, enabled, kind="rerun"):
+        self.enabled = enabled
+        self.begin(kind)
+
+    def begin(self, kind):
+        self.kind = kind
+        self.timers = {}
+        self.payloads = {}
+        self.caches = {}
+        self.context = {}
+        self.finished = False
+        self._started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] = self.timers.get(name, 0.0) + time.perf_counter() - start
+
+    def cache(self, name, cache):
+        """Record the cumulative ``hits``/``misses`` of an in-process cache."""
+        if self.enabled:
+            self.caches[name] = {"hits": cache.hits, "misses": cache.misses}
+
+    def vega_lite_chart(self, name, data, spec, **kwargs):
+        with self.timer(f"render.{name}"):
+            st.vega_lite_chart(data, spec, **kwargs)
+        if self.enabled:
+            self.payloads[name] = vega_payload_bytes(data, spec)
+
+    def plotly_chart(self, name, fig, **kwargs):
+        with self.timer(f"render.{name}"):
+            st.plotly_chart(fig, **kwargs)
+        if self.enabled:
+            self.payloads[name] = plotly_payload_bytes(fig)
+
+    def section(self, name):
+        """Decorator timing a fragment section.
+
+        A fragment-only rerun happens after the full run has finished, so the
+        section then records and exports a run of its own.
+        """
+        def decorate(func):
+            @functools.wraps(func)
+            def run(*args, **kwargs):
+                standalone = self.enabled and self.finished
+                if standalone:
+                    self.begin(f"fragment.{name}")
+                with self.timer(f"section.{name}"):
+                    result = func(*args, **kwargs)
+                if standalone:
+                    self.finish(panel=False)
+                return result
+            return run
+        return decorate
+
+    def record(self):
+        return {
+            "ts": round(time.time(), 3),
+            "kind": self.kind,
+            "total_s": round(time.perf_counter() - self._started, 6),
+            "timers_s": {name: round(seconds, 6) for name, seconds in self.timers.items()},
+            "payload_bytes": dict(self.payloads),
+            "caches": dict(self.caches),
+            "context": dict(self.context),
+        }
+
+    def finish(self, panel=True):
+        if not self.enabled or self.finished:
+            return
+        self.finished = True
+        record = self.record()
+        export(record)
+        if panel:
+            render_panel(record)
+
+
+def render_panel(record):
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        st.metric("Script run", f"{record['total_s'] * 1000:,.0f} ms")
+        timers = pd.Series(record["timers_s"], name="ms", dtype="float64").mul(1000).round(1)
+        st.dataframe(timers.rename_axis("Stage"), width="stretch")
+        if record["payload_bytes"]:
+            payloads = pd.Series(record["payload_bytes"], name="bytes", dtype="int64")
+            st.dataframe(payloads.rename_axis("Chart"), width="stretch")
+        if record["caches"]:
+            st.dataframe(pd.DataFrame(record["caches"]).T.rename_axis("Cache"), width="stretch")
+
+
+# --- process-wide export ---
+
+_lock = threading.Lock()
+_logger = None
+_totals = {"runs": {}, "timers": {}, "payloads": {}, "caches": {}}
+
+
+def _jsonl_logger():
+    global _logger
+    if _logger is None:
+        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_PATH, maxBytes=int(LOG_MAX_MB * (1 << 20)), backupCount=LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("food_access.perf")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def _add(totals, key, value):
+    total, count = totals.get(key, (0.0, 0))
+    totals[key] = (total + value, count + 1)
+
+
+def export(record):
+    with _lock:
+        _jsonl_logger().info(json.dumps(record))
+        _add(_totals["runs"], record["kind"], record["total_s"])
+        for name, seconds in record["timers_s"].items():
+            _add(_totals["timers"], name, seconds)
+        for name, nbytes in record["payload_bytes"].items():
+            _add(_totals["payloads"], name, nbytes)
+        _totals["caches"].update(record["caches"])
+        if PROM_PATH:
+            tmp = f"{PROM_PATH}.tmp"
+            with open(tmp, "w") as fh:
+                fh.write(_prometheus_text())
+            os.replace(tmp, PROM_PATH)
+
+
+def _summary(lines, metric, help_text, label, totals):
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} summary")
+    for key, (total, count) in sorted(totals.items()):
+        lines.append(f'{metric}_sum{{{label}="{key}"}} {total:.6f}')
+        lines.append(f'{metric}_count{{{label}="{key}"}} {count}')
+
+
+def _prometheus_text():
+    lines = []
+    _summary(lines, "food_access_run_seconds", "Script run wall time.", "kind", _totals["runs"])
+    _summary(lines, "food_access_stage_seconds", "Time spent per instrumented stage.", "stage", _totals["timers"])
+    _summary(lines, "food_access_chart_payload_bytes", "Chart payload sent to the browser.", "chart",
+             _totals["payloads"])
+    for field in ["hits", "misses"]:
+        metric = f"food_access_cache_{field}_total"
+        lines.append(f"# HELP {metric} Cache {field} of the in-process caches.")
+        lines.append(f"# TYPE {metric} counter")
+        for name, counts in sorted(_totals["caches"].items()):
+            lines.append(f'{metric}{{cache="{name}"}} {counts[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def prometheus_text():
+    """Process-wide totals in Prometheus text exposition format."""
+    with _lock:
+        return _prometheus_text()
@@ -0,0 +1,197 @@
+"""Batch precompute of every dashboard summary table and chart dataset.
+
+    python precompute.py [SOURCE.csv ...] [--out artifacts] [--force]
+
+Given source CSVs, the partition store is first (re)built from exactly those
+files, so the artifacts are for that input. Without them the published
+partitions are used, built from ``FOOD_ACCESS_CSV`` if there are none yet.
+
+For each state partition this writes headline metrics, the county summary
+behind the map and the chart datasets for the unfiltered view and for every
+single-county view into ``artifacts/<version>/state=<fips>/``, then points
+``artifacts/LATEST`` at the new version. The dashboard reads these tables
+whenever its filter state matches one of them and only computes the rest.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import analytics
+import chart_data
+import geo_store
+import partition_store
+from filter_index import FilterIndex
+from ranking import RankingIndex
+
+ARTIFACT_DIR = Path(os.environ.get("FOOD_ACCESS_ARTIFACT_DIR", Path(__file__).parent / "artifacts"))
+LATEST = "LATEST"
+
+# Bump when the artifact layout changes so stale artifacts are ignored
+ARTIFACT_SCHEMA = 2
+
+# Longest top-N list served from artifacts; larger or paged requests are computed live
+TOP_N = 50
+
+ALL_SCOPE = "All"
+
+
+def artifact_version(store_version):
+    digest = hashlib.sha1(store_version.encode()).hexdigest()[:12]
+    return f"v{ARTIFACT_SCHEMA}-{digest}"
+
+
+def latest_version(root=ARTIFACT_DIR):
+    try:
+        return (Path(root) / LATEST).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def default_income_range(df):
+    # Same bounds the sidebar slider starts with
+    return int(df["MedianFamilyIncome"].min()), int(df["MedianFamilyIncome"].max())
+
+
+def state_county_fips(df, state_fips):
+    has_geometry = geo_store.county_geometry_path(state_fips).exists()
+    return {**(geo_store.county_fips(state_fips) if has_geometry else {}), **partition_store.county_fips(df)}
+
+
+def _scoped(frames):
+    return pd.concat([frame.assign(Scope=scope) for scope, frame in frames], ignore_index=True)
+
+
+def precompute_state(df, state_fips, out_dir):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(out_dir / "summary.json", "w") as fh:
+        json.dump(analytics.summary_metrics(df), fh)
+    analytics.county_summary(df, state_county_fips(df, state_fips)).to_parquet(out_dir / "county_summary.parquet")
+
+    filter_index = FilterIndex(df)
+    ranking_index = RankingIndex(df)
+    income_range = default_income_range(df)
+    scopes = [ALL_SCOPE] + sorted(df["County"].dropna().astype(str).unique())
+
+    vehicle, scatter, scatter_bins = [], [], []
+    top = {metric: [] for metric in ranking_index.metrics}
+    for scope in scopes:
+        rows = filter_index.select(scope, (), False, income_range)
+        scatter_rows = filter_index.take(df, rows, chart_data.SCATTER_COLUMNS)
+        vehicle.append((scope, chart_data.vehicle_by_county(filter_index.take(df, rows, chart_data.VEHICLE_COLUMNS))))
+        if chart_data.use_binned_scatter(scatter_rows):
+            scatter_bins.append((scope, chart_data.scatter_bins(scatter_rows, highlight=scope)))
+        else:
+            scatter.append((scope, scatter_rows))
+        counties = None if scope == ALL_SCOPE else [scope]
+        for metric in ranking_index.metrics:
+            top_rows = ranking_index.top(metric, rows, TOP_N, 0, counties)
+            top[metric].append((scope, df.take(top_rows)[chart_data.TOP_TRACT_COLUMNS + [metric]]))
+
+    _scoped(vehicle).to_parquet(out_dir / "vehicle_by_county.parquet")
+    if scatter:
+        _scoped(scatter).to_parquet(out_dir / "scatter.parquet")
+    if scatter_bins:
+        _scoped(scatter_bins).to_parquet(out_dir / "scatter_bins.parquet")
+    for metric, frames in top.items():
+        _scoped(frames).to_parquet(out_dir / f"top_{metric}.parquet")
+
+
+def run(root=ARTIFACT_DIR, force=False, sources=None):
+    root = Path(root)
+    store_version = partition_store.ensure_partitions(sources=sources)
+    version = artifact_version(store_version)
+    version_dir = root / version
+    if (version_dir / "manifest.json").exists() and not force:
+        return version
+
+    started = time.perf_counter()
+    aggregates = partition_store.read_aggregates(store_version)
+    store = partition_store.PartitionStore(store_version)
+    for state_fips in aggregates["StateFIPS"]:
+        precompute_state(store.get(state_fips), state_fips, version_dir / f"state={state_fips}")
+    with open(version_dir / "national.json", "w") as fh:
+        json.dump(partition_store.national_summary(aggregates), fh)
+
+    # The manifest is written last: a version directory without one is incomplete
+    with open(version_dir / "manifest.json", "w") as fh:
+        json.dump({
+            "version": version,
+            "schema": ARTIFACT_SCHEMA,
+            "store_version": store_version,
+            "states": list(aggregates["StateFIPS"]),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "seconds": round(time.perf_counter() - started, 3),
+        }, fh, indent=2)
+    tmp = root / f"{LATEST}.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, root / LATEST)
+    return version
+
+
+class Artifacts:
+    """Read side of the precomputed artifacts, for one artifact version."""
+
+    def __init__(self, version_dir):
+        self.version_dir = Path(version_dir)
+        self.version = self.version_dir.name
+        self._tables = {}
+
+    @classmethod
+    def open(cls, store_version, root=ARTIFACT_DIR):
+        """Latest artifacts, or None if there are none or they predate the current data."""
+        version = latest_version(root)
+        if version is None or version != artifact_version(store_version):
+            return None
+        version_dir = Path(root) / version
+        if not (version_dir / "manifest.json").exists():
+            return None
+        return cls(version_dir)
+
+    def _state_dir(self, state_fips):
+        return self.version_dir / f"state={state_fips}"
+
+    def summary(self, state_fips):
+        with open(self._state_dir(state_fips) / "summary.json") as fh:
+            return json.load(fh)
+
+    def county_summary(self, state_fips):
+        return pd.read_parquet(self._state_dir(state_fips) / "county_summary.parquet")
+
+    def scoped(self, state_fips, name, scope):
+        """Rows of a per-scope table for ``scope`` ("All" or a county), or None."""
+        key = (state_fips, name)
+        if key not in self._tables:
+            path = self._state_dir(state_fips) / f"{name}.parquet"
+            if not path.exists():
+                self._tables[key] = {}
+            else:
+                table = pd.read_parquet(path)
+                self._tables[key] = {
+                    scope: frame.drop(columns="Scope").reset_index(drop=True)
+                    for scope, frame in table.groupby("Scope", sort=False)
+                }
+        return self._tables[key].get(scope)
+
+
+def precomputed_scope(filters, income_range):
+    """Artifact scope matching a filter state, or None if it has to be computed live."""
+    if filters["compare"] or filters["urban"] or tuple(filters["income"]) != tuple(income_range):
+        return None
+    return filters["county"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute dashboard tables into a versioned artifact directory.")
+    parser.add_argument("sources", nargs="*",
+                        help="Food Access Research Atlas CSV files to precompute for (default: the published partitions)")
+    parser.add_argument("--out", default=ARTIFACT_DIR, help="artifact root directory (default: ./artifacts)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if this version already exists")
+    args = parser.parse_args()
+    # Absolute paths, so the dashboard finds the recorded sources from any working directory
+    sources = [str(Path(source).resolve()) for source in args.sources] or None
+    print(f"Artifacts ready: {Path(args.out) / run(args.out, args.force, sources)}")
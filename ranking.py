@@ -0,0 +1,123 @@
+"""Precomputed ranking index for filtered top-N tract queries.
+
+For every ranked metric the index keeps a descending permutation of the whole
+state plus one descending segment per county. A filtered query walks only as
+far down those orders as it needs: counties are merged k-way, and the
+all-county order is scanned in chunks, so nothing is re-sorted per rerun.
+Tracts with a missing metric value are not ranked.
+"""
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Metric column -> label used in titles and axes
+RANK_METRICS = {
+    "LowAccessPopulation": "Low-Access Population",
+    "lapop1": "Low-Access Population (1 mile)",
+    "lalowi10": "Low-Income Low-Access Population (10 miles)",
+    "TractHUNV": "Households Without a Vehicle",
+}
+
+
+class RankingIndex:
+    def __init__(self, df, metrics=RANK_METRICS, cache_size=256):
+        self.n_rows = len(df)
+        counties = df["County"].astype("category")
+        codes = counties.cat.codes.to_numpy()
+        self._county_codes = {name: i for i, name in enumerate(counties.cat.categories)}
+
+        self._values = {}
+        self._order = {}
+        self._segments = {}
+        for metric in metrics:
+            if metric not in df:
+                continue
+            values = df[metric].to_numpy(dtype="float64", na_value=np.nan)
+            valid = np.flatnonzero(~np.isnan(values))
+            # Descending by value, ties in original row order (like DataFrame.nlargest)
+            order = valid[np.argsort(-values[valid], kind="stable")]
+            by_county = order[np.argsort(codes[order], kind="stable")]
+            bounds = np.searchsorted(codes[by_county], np.arange(len(self._county_codes) + 1))
+            self._values[metric] = values
+            self._order[metric] = order
+            self._segments[metric] = [by_county[bounds[i]:bounds[i + 1]] for i in range(len(self._county_codes))]
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def metrics(self):
+        return list(self._order)
+
+    def ranked_count(self, metric, rows):
+        """How many of the selected ``rows`` have a rankable value."""
+        return int(np.count_nonzero(~np.isnan(self._values[metric][rows])))
+
+    def _scan(self, order, allowed, stop):
+        # Walk the global order in growing chunks until ``stop`` allowed rows are found
+        found = []
+        total = 0
+        start = 0
+        chunk = max(stop * 4, 256)
+        while start < len(order) and total < stop:
+            block = order[start:start + chunk]
+            hit = block[allowed[block]]
+            found.append(hit)
+            total += len(hit)
+            start += chunk
+            chunk *= 2
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)[:stop]
+
+    def _merge(self, metric, county_names, allowed, stop):
+        values = self._values[metric]
+        runs = []
+        # A county named twice (selected and also under Compare) is merged once
+        for name in dict.fromkeys(county_names):
+            code = self._county_codes.get(name)
+            if code is None:
+                continue
+            segment = self._segments[metric][code]
+            segment = segment[allowed[segment]]
+            runs.append(zip((-values[segment]).tolist(), segment.tolist()))
+        merged = heapq.merge(*runs)
+        return np.fromiter((pos for _, pos in itertools.islice(merged, stop)), dtype=np.int64)
+
+    def top(self, metric, rows, n=10, offset=0, counties=None, key=None):
+        """Row positions of ranks ``offset`` .. ``offset + n`` among ``rows``, highest first.
+
+        ``rows`` are the filtered row positions. When the selection is limited to
+        some ``counties``, only those counties' segments are merged.
+        """
+        cache_key = None if key is None else (metric, key, n, offset)
+        if cache_key is not None:
+            with self._lock:
+                cached = self._cache.get(cache_key)
+                if cached is not None:
+                    self.hits += 1
+                    self._cache.move_to_end(cache_key)
+                    return cached
+            self.misses += 1
+
+        allowed = np.zeros(self.n_rows, dtype=bool)
+        allowed[rows] = True
+        stop = offset + n
+        if counties:
+            ranked = self._merge(metric, counties, allowed, stop)
+        else:
+            ranked = self._scan(self._order[metric], allowed, stop)
+        ranked = ranked[offset:stop]
+
+        if cache_key is not None:
+            with self._lock:
+                self._cache[cache_key] = ranked
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return ranked
@@ -0,0 +1,192 @@
+"""Spatial index over tract centroids for proximity queries.
+
+Centroids (from ``geo_store``) are joined to the data on ``CensusTract`` and
+stored as 3-D unit vectors. On the unit sphere the straight-line (chord)
+distance grows monotonically with great-circle distance, so a plain KD-tree
+over those vectors answers radius and k-nearest queries exactly in haversine
+terms. The tree is built once per dataset. A query only visits the nodes whose
+bounding box can reach the search ball. The matching leaves are then checked
+with vectorized numpy.
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+import analytics
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Columns kept for neighborhood aggregates
+NEIGHBORHOOD_COLUMNS = ["Pop2010", "LowAccessPopulation", "LILATracts_1And10", "PovertyRate"]
+
+
+def unit_vectors(lon, lat):
+    lon, lat = np.radians(lon), np.radians(lat)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def miles_to_chord(miles):
+    return 2 * np.sin(np.minimum(miles / EARTH_RADIUS_MILES, np.pi) / 2)
+
+
+def chord_to_miles(chord):
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.minimum(chord / 2, 1.0))
+
+
+class SpatialIndex:
+    def __init__(self, df, centroids, leaf_size=32):
+        # Tracts without a centroid in the geometry file are left out of the tree
+        slots = pd.Index(centroids["GEOID"]).get_indexer(analytics.tract_geoids(df))
+        rows = np.flatnonzero(slots >= 0)
+        lon = np.asarray(centroids["lon"], dtype="float64")[slots[rows]]
+        lat = np.asarray(centroids["lat"], dtype="float64")[slots[rows]]
+
+        self.n_rows = len(df)
+        self.leaf_size = leaf_size
+        self._points = unit_vectors(lon, lat)
+        self._rows = rows
+        self._lo, self._hi, self._bounds, self._children = [], [], [], []
+        if len(rows):
+            self._build(0, len(rows))
+        self._lo = np.array(self._lo).reshape(-1, 3)
+        self._hi = np.array(self._hi).reshape(-1, 3)
+
+        # Data row -> position in the tree order, -1 for tracts without a centroid
+        self._slot = np.full(self.n_rows, -1, dtype=np.int64)
+        self._slot[self._rows] = np.arange(len(self._rows))
+
+        self._values = {column: df[column].to_numpy(dtype="float64", na_value=np.nan)
+                        for column in NEIGHBORHOOD_COLUMNS}
+
+    def _build(self, start, end):
+        # Points are reordered in place so every node covers a contiguous slice
+        points = self._points[start:end]
+        node = len(self._bounds)
+        self._lo.append(points.min(axis=0))
+        self._hi.append(points.max(axis=0))
+        self._bounds.append((start, end))
+        self._children.append(None)
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(self._hi[node] - self._lo[node]))
+            mid = (start + end) // 2
+            order = np.argpartition(points[:, axis], mid - start)
+            self._points[start:end] = points[order]
+            self._rows[start:end] = self._rows[start:end][order]
+            self._children[node] = (self._build(start, mid), self._build(mid, end))
+        return node
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, row):
+        return self._slot[row] >= 0
+
+    def _gap(self, node, point):
+        # Squared distance from ``point`` to the node's bounding box
+        gap = np.maximum(self._lo[node] - point, 0) + np.maximum(point - self._hi[node], 0)
+        return float(gap @ gap)
+
+    def _allowed_slots(self, allowed):
+        # Boolean mask over data rows -> mask over tree positions
+        return None if allowed is None else np.asarray(allowed, dtype=bool)[self._rows]
+
+    def _result(self, slots, point, exclude):
+        slots = slots[slots != exclude]
+        chord = np.sqrt(((self._points[slots] - point) ** 2).sum(axis=1))
+        order = np.argsort(chord, kind="stable")
+        return self._rows[slots[order]], chord_to_miles(chord[order])
+
+    def within(self, row, miles, allowed=None):
+        """Data rows of the tracts within ``miles`` of tract ``row`` (itself excluded), nearest first.
+
+        ``allowed`` is an optional boolean mask over data rows; only those rows
+        are returned. Returns ``(rows, distances in miles)``.
+        """
+        allowed_slots = self._allowed_slots(allowed)
+        slot = self._slot[row]
+        point = self._points[slot]
+        radius2 = float(miles_to_chord(miles)) ** 2
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._gap(node, point) > radius2:
+                continue
+            start, end = self._bounds[node]
+            far = np.maximum(np.abs(point - self._lo[node]), np.abs(self._hi[node] - point))
+            if far @ far <= radius2:
+                # The whole box is inside the ball
+                found.append(np.arange(start, end))
+            elif self._children[node] is None:
+                d2 = ((self._points[start:end] - point) ** 2).sum(axis=1)
+                found.append(start + np.flatnonzero(d2 <= radius2))
+            else:
+                stack.extend(self._children[node])
+        slots = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        if allowed_slots is not None:
+            slots = slots[allowed_slots[slots]]
+        return self._result(slots, point, slot)
+
+    def nearest(self, row, k, allowed=None):
+        """Data rows of the ``k`` tracts closest to tract ``row`` (itself excluded), nearest first.
+
+        ``allowed`` is an optional boolean mask over data rows; the search goes
+        on until ``k`` of those are found. Returns ``(rows, distances in miles)``.
+        """
+        allowed_slots = self._allowed_slots(allowed)
+        slot = self._slot[row]
+        point = self._points[slot]
+        wanted = k
+        # One extra so the query tract itself can be dropped
+        k = min(k + 1, len(self._rows))
+        best = np.empty(0, dtype=np.int64)
+        best_d2 = np.empty(0)
+        kth = np.inf
+        heap = [(0.0, 0)]
+        while heap:
+            gap, node = heapq.heappop(heap)
+            if gap > kth:
+                break
+            children = self._children[node]
+            if children is None:
+                start, end = self._bounds[node]
+                leaf = np.arange(start, end)
+                if allowed_slots is not None:
+                    leaf = leaf[allowed_slots[leaf]]
+                best = np.concatenate([best, leaf])
+                best_d2 = np.concatenate([best_d2, ((self._points[leaf] - point) ** 2).sum(axis=1)])
+                if len(best) > k:
+                    keep = np.argpartition(best_d2, k - 1)[:k]
+                    best, best_d2 = best[keep], best_d2[keep]
+                if len(best) == k:
+                    kth = best_d2.max()
+            else:
+                for child in children:
+                    child_gap = self._gap(child, point)
+                    if child_gap <= kth:
+                        heapq.heappush(heap, (child_gap, child))
+        rows, miles = self._result(best, point, slot)
+        return rows[:wanted], miles[:wanted]
+
+    def summary(self, rows):
+        """Neighborhood aggregates over data ``rows``.
+
+        ``low_access_share`` is the share of residents with low access and
+        ``poverty_rate`` is population-weighted. ``lila_share`` is the share
+        of tracts flagged LILA.
+        """
+        population = self._values["Pop2010"][rows]
+        poverty = self._values["PovertyRate"][rows]
+        counted = ~np.isnan(population)
+        total = population[counted].sum()
+        weighted = counted & ~np.isnan(poverty)
+        poverty_weight = population[weighted].sum()
+        return {
+            "tracts": len(rows),
+            "population": float(total),
+            "low_access_share": float(np.nansum(self._values["LowAccessPopulation"][rows][counted]) / total * 100)
+                                if total else np.nan,
+            "lila_share": float(np.nanmean(self._values["LILATracts_1And10"][rows]) * 100) if len(rows) else np.nan,
+            "poverty_rate": float((poverty * population)[weighted].sum() / poverty_weight) if poverty_weight else np.nan,
+        }
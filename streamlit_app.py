@@ -1,17 +1,237 @@
+import functools
+import importlib
+import os
+
+import numpy as np
 import streamlit as st
-import pandas as pd
-import altair as alt
 
-df = pd.read_csv("Massachusetts Food Access Data - Sheet1.csv")
-st.set_page_config(layout="wide")
-st.title("🥗✅ Mapping Food Access in Massachusetts")
+import analytics
+import chart_data
+import charts
+import export
+import geo_store
+import partition_store
+import perf
+import precompute
+import vintages
+import warmup
+from filter_index import FilterIndex
+from ranking import RANK_METRICS, RankingIndex
+from spatial_index import SpatialIndex
+
+# Startup-optimized mode: the map and the Key Takeaways tabs are only built once
+# opened. FOOD_ACCESS_LAZY_SECTIONS=0 renders everything on page load.
+LAZY_SECTIONS = os.environ.get("FOOD_ACCESS_LAZY_SECTIONS", "1") != "0"
+
+
+def is_open(container):
+    # Expanders/tabs created with on_change="rerun" report whether they are showing
+    return not LAZY_SECTIONS or bool(container.open)
+
+
+# Memory-mapped state partitions of the published version, shared by every session
+# (and, through the page cache, every worker). Publishing a new version gives a
+# fresh store; the previous one is dropped once the next version is cached.
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_partition_store(version):
+    return partition_store.PartitionStore(version)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_aggregates(version):
+    return partition_store.read_aggregates(version)
+
+
+# Filter engine built once per dataset version and shared across sessions
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_filter_index(version, _df):
+    return FilterIndex(_df)
+
+
+# Entries kept by the per-filter-state caches below; the warm-up sizes itself to them
+SCATTER_BINS_ENTRIES = 64
+MAP_FIGURE_ENTRIES = 64
+
+
+# Binned scatter data for large selections, computed once per filter state
+@st.cache_data(max_entries=SCATTER_BINS_ENTRIES, show_spinner=False)
+def scatter_bins(version, key, highlight, _filtered):
+    return chart_data.scatter_bins(_filtered, highlight=highlight)
+
+
+# Per-county bar data, aggregated once per filter state
+@st.cache_data(max_entries=256, show_spinner=False)
+def vehicle_by_county(version, key, _filtered):
+    return chart_data.vehicle_by_county(_filtered)
+
+
+# Precomputed tables from the batch job (precompute.py); None when missing or stale.
+# Keyed on the LATEST pointer so a new nightly run is picked up without a restart.
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_artifacts(store_version, latest):
+    return precompute.Artifacts.open(store_version)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def state_metrics(version, _df):
+    return analytics.summary_metrics(_df)
 
-df["County"] = df["County"].str.replace(" County", "", regex=False)
-df["Pct_Households_No_Vehicle"] = (df["TractHUNV"] / df["OHU2010"]) * 100
-df["LowAccessPopulation"] = df["LALOWI05_10"].fillna(0)
 
-# Top 10 tracts by food inaccessibility
-top10 = df.nlargest(10, "LowAccessPopulation")[["CensusTract", "County", "LowAccessPopulation"]]
+# Per-metric / per-county ranking orders, built once per dataset version
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_ranking_index(version, _df):
+    return RankingIndex(_df)
+
+
+# KD-tree over the state's tract centroids, built once per dataset version
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_spatial_index(version, state_fips, _df):
+    return SpatialIndex(_df, geo_store.load_tract_centroids(state_fips))
+
+
+# Nearby tracts picker: GEOIDs, the rows with a centroid ordered by county then tract,
+# their labels and each county's first option, built once per dataset version
+@st.cache_resource(max_entries=16, show_spinner=False)
+def nearby_tracts(version, state_fips, _df, _spatial_index):
+    geoids = analytics.tract_geoids(_df).to_numpy()
+    counties = _df["County"].astype(str).to_numpy()
+    order = np.lexsort((_df["CensusTract"].to_numpy(), counties))
+    options = [int(row) for row in order if row in _spatial_index]
+    labels = {row: f"{geoids[row]} ({counties[row]} County)" for row in options}
+    first_in_county = {}
+    for i, row in enumerate(options):
+        first_in_county.setdefault(counties[row], i)
+    return geoids, options, labels, first_in_county
+
+
+# Earlier Atlas vintages aligned to this state's rows; each vintage is loaded on first use
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_aligned_vintages(version, state_fips, catalog, _df):
+    return vintages.AlignedVintages(_df, state_fips)
+
+
+# County-level summary for the map, computed once per state
+@st.cache_data(max_entries=16, show_spinner=False)
+def county_summary_table(version, _df, county_fips):
+    return analytics.county_summary(_df, county_fips)
+
+
+# Map figure, built once per map section key (state, highlighted county). County
+# summaries come from ``_artifacts`` when there are any, keyed on their version.
+@st.cache_resource(max_entries=MAP_FIGURE_ENTRIES, show_spinner=False)
+def map_figure(version, artifacts_version, key, state_name, _df, _artifacts):
+    # Plotly is only imported once someone opens the map
+    import plotly.graph_objects as go
+
+    state_fips, selected_county = key
+    geo_json = geo_store.load_county_geometry(state_fips)
+    # County FIPS come from the partition's CensusTract codes; the geometry store adds
+    # counties that have no tracts in the data
+    county_fips = {**geo_store.county_fips(state_fips), **partition_store.county_fips(_df)}
+
+    if _artifacts is not None:
+        county_summary = _artifacts.county_summary(state_fips)
+    else:
+        county_summary = county_summary_table(version, _df, county_fips)
+
+    choropleth = go.Choropleth(
+        geojson=geo_json,
+        locations=county_summary["fips"],
+        z=county_summary["% LILA Tracts"],
+        colorscale="Reds",
+        zmin=0,
+        zmax=county_summary["% LILA Tracts"].max(),
+        marker_line_color="black",
+        marker_line_width=0.5,
+        featureidkey="id",
+        colorbar_title="% LILA Tracts",
+        customdata=analytics.county_hover_data(county_summary),
+        hovertemplate=analytics.COUNTY_HOVER_TEMPLATE)
+
+    highlight = None
+    if selected_county != "All" and selected_county in county_fips:
+        selected_fips = county_fips[selected_county]
+        selected_feature = geo_store.feature_by_fips(state_fips, selected_fips)
+        if selected_feature:
+            highlight = go.Choropleth(
+                geojson={"type": "FeatureCollection", "features": [selected_feature]},
+                locations=[selected_fips],
+                z=[0],
+                colorscale=[[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+                showscale=False,
+                marker_line_color="black",
+                marker_line_width=2.8,
+                featureidkey="id",
+                hoverinfo="skip")
+
+    fig = go.Figure(data=[choropleth] + ([highlight] if highlight else []))
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_layout(
+        title=f"Percentage of Low-Income Low-Access (LILA) Tracts by {state_name} County",
+        margin={"r": 0, "t": 50, "l": 0, "b": 0})
+    return fig
+
+
+# Tract map figure, built once per map section key and metric. A whole-state view
+# uses the coarse geometry; with a county chosen only its tracts are sent, at the
+# finer zoom level.
+@st.cache_resource(max_entries=64, show_spinner=False)
+def tract_map_figure(version, key, metric, state_name, _df):
+    import plotly.graph_objects as go
+
+    state_fips, selected_county = key
+    if selected_county == "All":
+        level, counties, tracts = "state", None, _df
+    else:
+        level = "county"
+        counties = (partition_store.county_fips(_df).get(selected_county),)
+        tracts = _df[_df["County"] == selected_county]
+
+    label, _ = analytics.TRACT_MAP_METRICS[metric]
+    fig = go.Figure(go.Choropleth(
+        geojson=geo_store.tract_features(state_fips, level, counties),
+        locations=analytics.tract_geoids(tracts),
+        z=tracts[metric].astype("float64"),
+        colorscale="Reds",
+        marker_line_color="black",
+        marker_line_width=0.2,
+        featureidkey="id",
+        colorbar_title=label,
+        customdata=analytics.tract_hover_data(tracts),
+        hovertemplate=analytics.tract_hover_template(metric)))
+    fig.update_geos(fitbounds="locations", visible=False)
+    place = state_name if selected_county == "All" else f"{selected_county} County, {state_name}"
+    fig.update_layout(
+        title=f"{label} by Census Tract in {place}",
+        margin={"r": 0, "t": 50, "l": 0, "b": 0})
+    return fig
+
+
+# Opt-in instrumentation (FOOD_ACCESS_PERF=1 or ?perf=1); a no-op otherwise
+recorder = perf.Recorder(perf.enabled())
+
+with recorder.timer("load.partitions"):
+    store_version = partition_store.ensure_partitions()
+    aggregates = load_aggregates(store_version)
+state_options = dict(zip(aggregates["State"], aggregates["StateFIPS"]))
+
+st.set_page_config(layout="wide")
+
+# Sidebar Filters
+st.sidebar.header("🔎 Filters")
+state_names = sorted(state_options)
+selected_state = st.sidebar.selectbox("State", state_names,
+                                      index=state_names.index("Massachusetts") if "Massachusetts" in state_names else 0,
+                                      help="Choose which state's census tracts to explore. Only that state's data is loaded.")
+state_fips = state_options[selected_state]
+data_version = f"{store_version}|{state_fips}"
+partitions = get_partition_store(store_version)
+with recorder.timer("load.state"):
+    df = partitions.get(state_fips)
+recorder.cache("partitions", partitions)
+recorder.context.update(state=state_fips, rows=len(df))
+
+st.title(f"🥗✅ Mapping Food Access in {selected_state}")
 
 st.subheader("📝 Understanding Food Access")
 
@@ -26,7 +246,9 @@ accessibility. It is fundamentally linked to public health, economic stability,
 When access is limited, individuals may face food insecurity: limited or uncertain availability 
 of adequate food, often due to lack of money or resources. This is common in food deserts (areas 
 with limited access to grocery stores) and food swamps (areas with many fast food and convenience stores).
-
+""")
+    if selected_state == "Massachusetts":
+        st.markdown("""
 Despite being one of the wealthiest states, Massachusetts faces serious food access challenges 
 across its diverse communities. Urban areas often lack grocery stores in low-income neighborhoods, 
 while rural areas struggle with transportation barriers.
@@ -34,6 +256,13 @@ while rural areas struggle with transportation barriers.
 This dashboard focuses on Massachusetts to show that food insecurity can persist even in states 
 with strong safety nets. These patterns highlight how economic inequality, geography, and systemic 
 issues shape food access – offering insights that apply across the U.S.
+""")
+    else:
+        st.markdown(f"""
+This dashboard explores food access across {selected_state}'s census tracts. Urban areas often lack 
+grocery stores in low-income neighborhoods, while rural areas struggle with transportation barriers. 
+These patterns highlight how economic inequality, geography, and systemic issues shape food access 
+across the U.S.
 """)
 
 with defs_tab:
@@ -71,423 +300,639 @@ with tips_tab:
 
 st.markdown("### ")
 
-total_tracts = len(df)
-percent_LILA = (df["LILATracts_1And10"].sum() / total_tracts) * 100
-avg_poverty = df["PovertyRate"].mean()
-avg_income = df["MedianFamilyIncome"].mean()
+with recorder.timer("load.artifacts"):
+    artifacts = get_artifacts(store_version, precompute.latest_version())
+artifacts_version = artifacts.version if artifacts is not None else None
+
+
+def from_artifacts(name, scope):
+    if artifacts is None or scope is None:
+        return None
+    return artifacts.scoped(state_fips, name, scope)
+
+
+with recorder.timer("aggregate.metrics"):
+    metrics = artifacts.summary(state_fips) if artifacts else state_metrics(data_version, df)
 
 col1, col2, col3, col4 = st.columns(4)
-col1.metric("Total Census Tracts", f"{total_tracts}")
-col2.metric("% LILA Tracts", f"{percent_LILA:.1f}%")
-col3.metric("Average Poverty Rate", f"{avg_poverty:.1f}%")
-col4.metric("Average Median Family Income", f"${avg_income:,.0f}")
+col1.metric("Total Census Tracts", f"{metrics['total_tracts']}")
+col2.metric("% LILA Tracts", f"{metrics['percent_LILA']:.1f}%")
+col3.metric("Average Poverty Rate", f"{metrics['avg_poverty']:.1f}%")
+col4.metric("Average Median Family Income", f"${metrics['avg_income']:,.0f}")
+if len(aggregates) > 1:
+    # Nationwide figures come from per-partition aggregates, never the full table
+    national = partition_store.national_summary(aggregates)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Nationwide Census Tracts", f"{national['total_tracts']:,}")
+    col2.metric("Nationwide % LILA Tracts", f"{national['percent_LILA']:.1f}%")
+    col3.metric("Nationwide Average Poverty Rate", f"{national['avg_poverty']:.1f}%")
+    col4.metric("Nationwide Average Median Family Income", f"${national['avg_income']:,.0f}")
 st.write("*Note: The data used in this dashboard is from the USDA Food Access Research Atlas from 2019.")
 
 st.markdown("---")
 
-# Sidebar Filters
-st.sidebar.header("🔎 Filters")
 counties = ["All"] + sorted(df["County"].dropna().unique())
 selected_county = st.sidebar.selectbox("County", counties, help="Select a specific county to focus on, or choose 'All' to view data for all counties."  \
 " Selected county will be highlighted in all 3 visualizations.")
 
 counties_multi= sorted(df["County"].dropna().unique())
 selected_counties= st.sidebar.multiselect("Compare with Other Counties", counties_multi, help="Choose additional counties to compare alongside your main" \
-" county selection. This allows you to analyze multiple counties simultaneously. This only applies to the first visualization.")
+" county selection. This allows you to analyze multiple counties simultaneously. This applies to the first two visualizations.")
 
 urban_only = st.sidebar.checkbox("Urban Tracts Only", value=False, help="Check this box to filter the data to show only urban census tracts." \
-" This excludes rural and suburban areas. Only applies to the first visualization.")
+" This excludes rural and suburban areas. Applies to the first two visualizations.")
 income_min = int(df["MedianFamilyIncome"].min())
 income_max = int(df["MedianFamilyIncome"].max())
 income_range = st.sidebar.slider("Median Income Range", min_value=income_min,
                                  max_value=income_max, value=(income_min, income_max), help="Adjust this range to filter by" \
                                  " median family income, helping you focus on specific economic segments of the population." \
-                                 " Only applies to the first visualization.")
-
-filtered = df.copy()
-if selected_county != "All" and selected_counties:
-    all_counties = [selected_county] + selected_counties
-    filtered = filtered[filtered["County"].isin(all_counties)]
-elif selected_county != "All":
-    filtered = filtered[filtered["County"] == selected_county]
-elif selected_counties:
-    filtered = filtered[filtered["County"].isin(selected_counties)]
-if urban_only: filtered = filtered[filtered["Urban"] == 1]
-filtered = filtered[(filtered["MedianFamilyIncome"] >= income_range[0]) &
-                    (filtered["MedianFamilyIncome"] <= income_range[1])]
-
-# Shared selection - responds to both point hover and legend clicks
-selection = alt.selection_point(
-    fields=["County"],
-    bind='legend',
-    on="mouseover"
-)
-
-# Chart 1: Scatter Plot
-st.subheader("📊 Relationships Between Income, Poverty & Vehicle Access",
-help="This scatter plot shows how median family income relates to poverty rates." \
-" The bar graph shows the percentage of households without vehicles in each county.")
-st.write("🔍 **Sidebar:** Select County, Compare with Other Counties, Urban Tracts Only, and Median Income Range to explore.")
-st.write("📈 **Chart:** Zoom in and out of the scatterplot. Hover over the scatter plot and bar graph to view more information. Click" \
-" on the legend to see specific census tracts in each county.")
-
-scatter = alt.Chart(filtered).mark_circle(opacity=0.7).encode(
-    x=alt.X("MedianFamilyIncome:Q", title="Median Family Income"),
-    y=alt.Y("PovertyRate:Q", title="Poverty Rate (%)"),
-    size=alt.Size("Pop2010:Q", title="Population", scale=alt.Scale(range=[0, 120])),
-    color=alt.condition(
-        selection,
-        "County:N",
-        alt.value('lightgray'),
-        title="County",
-        scale=alt.Scale(scheme='category20')
-    ),
-    tooltip=[
-    alt.Tooltip("CensusTract:N", title="Census Tract"),
-    alt.Tooltip("County:N", title="County"),
-    alt.Tooltip("Pop2010:Q", title="Population", format=",.0f"),
-    alt.Tooltip("PovertyRate:Q", title="Poverty Rate (%)", format=".2f"),
-    alt.Tooltip("MedianFamilyIncome:Q", title="Median Family Income", format="$.2f")
-]
-).properties(
-    title="Median Family Income vs Poverty Rate",
-    width=600,
-    height=430
-).add_params(
-    selection
-).interactive()
-
-
-# Chart 2A: Bar Chart (linked to scatter)
-bar_chart = alt.Chart(filtered).mark_bar().encode(
-    x=alt.X("mean(Pct_Households_No_Vehicle):Q", title="% Without Vehicle", scale=alt.Scale(domain=[0, 40])),
-    y=alt.Y("County:N", sort="-x", title="County"),
-    color=alt.condition(
-        selection,
-        'County:N',
-        alt.value('lightgray'),
-        title='County',
-        scale=alt.Scale(scheme='category20')
-    ),
-    tooltip=[
-    alt.Tooltip("mean(Pct_Households_No_Vehicle):Q", title="% Without Vehicle", format=".2f")
-]
-).properties(
-    title="Percentage of Households Without Vehicles",
-    width=600,
-    height=430
-).add_params(
-    selection)
-
-# Chart 2B: Full fallback bar chart (unlinked)
-bar_fallback = alt.Chart(filtered).mark_bar().encode(
-    x=alt.X("mean(Pct_Households_No_Vehicle):Q", title="% Without Vehicle", scale=alt.Scale(domain=[0, 40])),
-    y=alt.Y("County:N", sort="-x", title="County"),
-    color=alt.condition(
-        selection,
-        'County:N',
-        alt.value('lightgray'),
-        title="County",
-        scale=alt.Scale(scheme='category20')
-    ),
-    tooltip=[
-        alt.Tooltip("mean(Pct_Households_No_Vehicle):Q", title="% Without Vehicle", format=".2f")
-    ]
-).properties(
-    title="Percentage of Households Without Vehicles",
-    width=600,
-    height=430
-).add_params(
-    selection)
-
-
-# Layout: Put Chart 1 and Chart 2 fallback together
-col1, col2 = st.columns(2)
-with col1:
-    st.altair_chart(scatter, use_container_width=True)
-with col2:
-    st.altair_chart(bar_fallback, use_container_width=True)
-
-
-st.markdown(
-    f"""
-    <div style="background-color: #fffbe6; padding: 1rem; border-radius: 0.5rem; text-align: left; color: #665c00; font-size: 16px;">
-        💡 Census tracts with <strong>lower median family incomes</strong> often experience <strong>higher poverty rates</strong>, creating a visible inverse trend. These areas also tend to have <strong>more households without vehicles</strong>, deepening access challenges to essential services like grocery stores.<br><br>
-        Suffolk and Hampden counties stand out with the <strong>highest share of households lacking vehicles</strong> – a key factor in food access vulnerability.
-    </div>""", unsafe_allow_html=True)
-
-st.markdown("---")
-
-
-# Chart 3: Food Inaccessible Tracts with Selection Options
-st.subheader("🏙️ Food Inaccessible Tracts Analysis", help="This bar graph shows the top 10 census tracts with the lowest food access.")
-st.write("🔍 **Sidebar:** Select County to explore.")
-st.write("📈 **Chart:** Select from selection box/drop down to view graphs. Hover over each bar to view exact numbers of low access population and see which counties are in the top 10!")
-
-# Create selection dropdown
-view_option = st.selectbox(
-    "Select view:",
-    options=[
-        "Top 10 Highest Low-Access Population",
-        "Highest to Lowest by Low-Access Population", 
-        "Lowest to Highest by Low-Access Population",
-    ],
-    index=0  # Default to first option
-)
-
-# Create shared color scale for consistency
-county_color_scale = alt.Scale(scheme='category20')
-
-# Function to create conditional opacity encoding based on selected county
-def get_opacity_encoding(selected_county):
-    # Always return full opacity - we'll only use stroke for highlighting
-    return alt.value(1.0)
-
-# Function to get stroke encoding based on selected county
-def get_stroke_encoding(selected_county):
-    if selected_county != "All":
-        return alt.condition(
-            alt.datum.County == selected_county,
-            alt.value('black'),
-            alt.value('transparent')
-        )
+                                 " Applies to the first two visualizations.")
+
+filters = {
+    "state": state_fips,
+    "county": selected_county,
+    "compare": tuple(selected_counties),
+    "urban": urban_only,
+    "income": tuple(income_range),
+}
+recorder.context["filters"] = filters
+
+# Which sidebar inputs each section reads (mirrors the help text on each filter).
+# Sections cache their inputs on just these values, so a sidebar change only
+# recomputes the sections that depend on it; widgets inside a section (e.g.
+# "Select view:") rerun only that section's fragment.
+SECTION_DEPENDENCIES = {
+    "relationships": ("state", "county", "compare", "urban", "income"),
+    "top_tracts": ("state", "county", "compare", "urban", "income"),
+    "map": ("state", "county"),
+    "export": ("state", "county", "compare", "urban", "income"),
+}
+
+
+# Number of tracts the top tracts chart starts with
+DEFAULT_TOP_N = 10
+
+
+def section_key(section, filters):
+    return tuple(filters[name] for name in SECTION_DEPENDENCIES[section])
+
+
+def geometry_by_id(collection):
+    return {feature["id"]: feature["geometry"] for feature in collection["features"]}
+
+
+# Downloads are only written when a button is clicked; the file is then cached on
+# disk under the filter key, so the same selection is never exported twice
+@st.fragment
+@recorder.section("export")
+def export_section(filters):
+    st.header("⬇️ Export")
+    fmt = st.radio("Format", list(export.FORMATS), horizontal=True,
+                   help="Download exactly the tracts selected by the filters above, with every Atlas column,"
+                        " or their per-county summary.")
+    extension, mime = export.FORMATS[fmt]
+    filter_index = get_filter_index(data_version, df)
+    rows = filter_index.select(filters["county"], filters["compare"], filters["urban"], filters["income"])
+    key = (data_version, section_key("export", filters), fmt)
+
+    def tracts_file():
+        geometry = None
+        if fmt == "GeoJSON" and geo_store.has_tract_geometry(state_fips):
+            geometry = geometry_by_id(geo_store.tract_features(state_fips, "county"))
+        return export.export_file("tracts", key, fmt, df, rows, analytics.tract_geoids, geometry)
+
+    def county_summary_file():
+        county_fips = partition_store.county_fips(df)
+        summary = analytics.county_summary(filter_index.take(df, rows, analytics.COUNTY_SUMMARY_COLUMNS))
+        summary["fips"] = summary["County"].map(county_fips)
+        geometry = None
+        if fmt == "GeoJSON" and geo_store.county_geometry_path(state_fips).exists():
+            geometry = geometry_by_id(geo_store.load_county_geometry(state_fips))
+        return export.export_file("county_summary", key, fmt, summary, ids=lambda chunk: chunk["fips"],
+                                  geometry=geometry)
+
+    def download(label, name, make):
+        file_name = f"food_access_{name}{extension}"
+        path = export.export_path(name, key, fmt)
+        slot = st.empty()
+        if st.get_option("server.enableStaticServing"):
+            # Written on request, then downloaded from disk by Streamlit's static file route
+            if not path.exists():
+                if not slot.button(f"Prepare {label.lower()}", key=f"export_{name}", width="stretch"):
+                    return
+                with st.spinner("Writing export..."):
+                    path = make()
+            url = export.static_url(path)
+            if url is not None:
+                slot.markdown(f'<a href="{url}" download="{file_name}">⬇️ {label}</a>', unsafe_allow_html=True)
+                return
+        # Without static serving (or past its size limit) Streamlit holds the file in memory to serve it
+        slot.download_button(label, lambda: make().read_bytes(), file_name=file_name, mime=mime,
+                             on_click="ignore", width="stretch")
+
+    download(f"Filtered tracts ({len(rows):,})", "tracts", tracts_file)
+    download("County summary", "county_summary", county_summary_file)
+
+
+with st.sidebar:
+    export_section(filters)
+
+
+# Chart data behind each section, computed through the shared caches. The sections
+# render it, timed into this run's recorder; the warm-up calls the same functions for
+# every single-county view with a disabled recorder of its own.
+def relationships_data(filters, recorder=recorder):
+    """Scatter and vehicle-bar chart specs and data for a filter state."""
+    # Serve precomputed datasets when the filter state has them, otherwise filter live
+    with recorder.timer("relationships.artifacts"):
+        scope = precompute.precomputed_scope(filters, (income_min, income_max))
+        vehicle_data = from_artifacts("vehicle_by_county", scope)
+        binned_data = from_artifacts("scatter_bins", scope)
+        points_data = from_artifacts("scatter", scope)
+    if vehicle_data is None or (binned_data is None and points_data is None):
+        with recorder.timer("relationships.filter"):
+            filter_index = get_filter_index(data_version, df)
+            filtered_rows = filter_index.select(filters["county"], filters["compare"], filters["urban"], filters["income"])
+            # Only the charted columns of the selected rows are gathered; the table itself is shared
+            scatter_rows = filter_index.take(df, filtered_rows, chart_data.SCATTER_COLUMNS)
+            vehicle_rows = filter_index.take(df, filtered_rows, chart_data.VEHICLE_COLUMNS)
+        recorder.cache("filter_index", filter_index)
+        filter_key = section_key("relationships", filters)
+        with recorder.timer("relationships.aggregate"):
+            vehicle_data = vehicle_by_county(data_version, filter_key, vehicle_rows)
+            binned_data = points_data = None
+            if chart_data.use_binned_scatter(scatter_rows):
+                binned_data = scatter_bins(data_version, filter_key, filters["county"], scatter_rows)
+            else:
+                points_data = scatter_rows
+
+    if binned_data is not None:
+        scatter_spec = charts.ChartSpec("scatter_bins", "Median Family Income vs Poverty Rate")
+        scatter_data = binned_data
     else:
-        return alt.value('transparent')
-
-# Function to get stroke width encoding based on selected county  
-def get_stroke_width_encoding(selected_county):
-    if selected_county != "All":
-        return alt.condition(
-            alt.datum.County == selected_county,
-            alt.value(3),
-            alt.value(0)
-        )
+        scatter_spec = charts.ChartSpec("scatter", "Median Family Income vs Poverty Rate")
+        scatter_data = points_data
+
+    vehicle_spec = charts.ChartSpec("vehicle_bars", "Percentage of Households Without Vehicles",
+                                    value_field=chart_data.vehicle_field())
+    return scatter_spec, scatter_data, vehicle_spec, vehicle_data
+
+
+def top_tract_pages(filters, metric, top_n):
+    filter_index = get_filter_index(data_version, df)
+    filtered_rows = filter_index.select(filters["county"], filters["compare"], filters["urban"], filters["income"])
+    total = get_ranking_index(data_version, df).ranked_count(metric, filtered_rows)
+    return max(1, -(-total // top_n))
+
+
+def top_tracts_data(filters, metric, top_n, view_option, page=1, recorder=recorder):
+    """Top tracts chart spec and rows for a filter state, metric, view and page."""
+    selected_county = filters["county"]
+    sort, title, _, paged = charts.TOP_TRACT_VIEWS[view_option]
+    label = RANK_METRICS[metric]
+
+    top_tracts = None
+    if not paged and top_n <= precompute.TOP_N:
+        with recorder.timer("top_tracts.artifacts"):
+            scope = precompute.precomputed_scope(filters, (income_min, income_max))
+            top_tracts = from_artifacts(f"top_{metric}", scope)
+    if top_tracts is not None:
+        top_tracts = top_tracts.head(top_n)
     else:
-        return alt.value(0)
-
-# Prepare data and display chart based on selection
-if view_option == "Top 10 Highest Low-Access Population":
-    # Chart 1: Default - Top 10 with highlighting
-    bar_chart = alt.Chart(top10).mark_bar().encode(
-        x=alt.X("CensusTract:N", sort="-x", title="Census Tract", axis=alt.Axis(labelAngle=0)),
-        y=alt.Y("LowAccessPopulation:Q", title="Low-Access Population"),
-        color=alt.Color("County:N", scale=county_color_scale, title="County"),
-        opacity=get_opacity_encoding(selected_county),
-        stroke=get_stroke_encoding(selected_county),
-        strokeWidth=get_stroke_width_encoding(selected_county),
-        tooltip=[
-            alt.Tooltip("County:N", title="County"),
-            alt.Tooltip("LowAccessPopulation:Q", title="Low-Access Population", format=",.2f")
-        ]
-    ).properties(
-        width=700,
-        height=400,
-        title="Top 10 Tracts with Highest Food Inaccessibility"
-    )
-    st.write("Top 10 census tracts color-coded by county to show which counties have the highest low-access populations.")
-    
-elif view_option == "Highest to Lowest by Low-Access Population":
-    # Chart 2: All tracts highest to lowest with highlighting
-    bar_chart = alt.Chart(top10).mark_bar().encode(
-        x=alt.X("CensusTract:N", sort="-y", title="Census Tract", axis=alt.Axis(labelAngle=0)),
-        y=alt.Y("LowAccessPopulation:Q", title="Low-Access Population"),
-        color=alt.Color("County:N", scale=county_color_scale, title="County"),
-        opacity=get_opacity_encoding(selected_county),
-        stroke=get_stroke_encoding(selected_county),
-        strokeWidth=get_stroke_width_encoding(selected_county),
-        tooltip=[
-            alt.Tooltip("County:N", title="County"),
-            alt.Tooltip("LowAccessPopulation:Q", title="Low-Access Population", format=",.2f")
-        ]
-    ).properties(
-        width=700,
-        height=400,
-        title="Top 10 Census Tracts Highest to Lowest by Low-Access Population"
-    )
-    st.write("Top 10 census tracts ranked from highest to lowest low-access population.")
-    
-else:
-    bar_chart = alt.Chart(top10).mark_bar().encode(
-        x=alt.X("CensusTract:N", sort="y", title="Census Tract", axis=alt.Axis(labelAngle=0)),
-        y=alt.Y("LowAccessPopulation:Q", title="Low-Access Population"),
-        color=alt.Color("County:N", scale=county_color_scale, title="County"),
-        opacity=get_opacity_encoding(selected_county),
-        stroke=get_stroke_encoding(selected_county),
-        strokeWidth=get_stroke_width_encoding(selected_county),
-        tooltip=[
-            alt.Tooltip("County:N", title="County"),
-            alt.Tooltip("LowAccessPopulation:Q", title="Low-Access Population", format=",.2f")
-        ]
-    ).properties(
-        width=700,
-        height=400,
-        title="Top 10 Census Tracts Lowest to Highest Low-Access Population"
+        with recorder.timer("top_tracts.filter"):
+            filter_index = get_filter_index(data_version, df)
+            filtered_rows = filter_index.select(filters["county"], filters["compare"], filters["urban"], filters["income"])
+        recorder.cache("filter_index", filter_index)
+        ranking_index = get_ranking_index(data_version, df)
+        if selected_county != "All":
+            ranked_counties = [selected_county] + list(filters["compare"])
+        else:
+            ranked_counties = list(filters["compare"])
+
+        offset = 0
+        if paged:
+            total = ranking_index.ranked_count(metric, filtered_rows)
+            offset = (page - 1) * top_n
+            if total:
+                title = f"{title} (ranks {offset + 1:,}–{min(offset + top_n, total):,} of {total:,})"
+
+        with recorder.timer("top_tracts.rank"):
+            top_rows = ranking_index.top(metric, filtered_rows, top_n, offset, ranked_counties,
+                                         key=section_key("top_tracts", filters))
+            top_tracts = df.take(top_rows)[chart_data.TOP_TRACT_COLUMNS + [metric]]
+        recorder.cache("ranking_index", ranking_index)
+
+    top_spec = charts.ChartSpec("top_tracts", title.format(n=top_n, label=label), sort=sort,
+                                highlight_county=selected_county, value_field=metric, value_title=label)
+    return top_spec, top_tracts
+
+
+@st.fragment
+@recorder.section("relationships")
+def relationships_section(filters):
+    # Chart 1: Scatter Plot
+    st.subheader("📊 Relationships Between Income, Poverty & Vehicle Access",
+    help="This scatter plot shows how median family income relates to poverty rates." \
+    " The bar graph shows the percentage of households without vehicles in each county.")
+    st.write("🔍 **Sidebar:** Select County, Compare with Other Counties, Urban Tracts Only, and Median Income Range to explore.")
+    st.write("📈 **Chart:** Zoom in and out of the scatterplot. Hover over the scatter plot and bar graph to view more information. Click" \
+    " on the legend to see specific census tracts in each county.")
+
+    scatter_spec, scatter_data, vehicle_spec, vehicle_data = relationships_data(filters)
+    if scatter_spec.kind == "scatter_bins":
+        # Level-of-detail mode: too many tracts to draw one point each
+        binned_tracts = int(scatter_data.loc[~scatter_data["Selected"].astype(bool), "Tracts"].sum())
+        st.caption(f"Showing {binned_tracts:,} tracts as population-weighted bins. Narrow the"
+                   " counties or income range to see individual tracts.")
+    with recorder.timer("relationships.chart_specs"):
+        scatter_vega = charts.vega_lite_spec(scatter_spec, scatter_data)
+        vehicle_vega = charts.vega_lite_spec(vehicle_spec, vehicle_data)
+
+    # Layout: scatter and vehicle bars side by side
+    col1, col2 = st.columns(2)
+    with col1:
+        recorder.vega_lite_chart(scatter_spec.kind, scatter_data, scatter_vega, width="stretch")
+    with col2:
+        recorder.vega_lite_chart(vehicle_spec.kind, vehicle_data, vehicle_vega, width="stretch")
+
+
+    vehicle_note = ""
+    if selected_state == "Massachusetts":
+        vehicle_note = ("<br><br>Suffolk and Hampden counties stand out with the <strong>highest share of households"
+                        " lacking vehicles</strong> – a key factor in food access vulnerability.")
+    st.markdown(
+        f"""
+        <div style="background-color: #fffbe6; padding: 1rem; border-radius: 0.5rem; text-align: left; color: #665c00; font-size: 16px;">
+            💡 Census tracts with <strong>lower median family incomes</strong> often experience <strong>higher poverty rates</strong>, creating a visible inverse trend. These areas also tend to have <strong>more households without vehicles</strong>, deepening access challenges to essential services like grocery stores.{vehicle_note}
+        </div>""", unsafe_allow_html=True)
+
+
+@st.fragment
+@recorder.section("top_tracts")
+def top_tracts_section(filters):
+    # Chart 3: Food Inaccessible Tracts with Selection Options
+    st.subheader("🏙️ Food Inaccessible Tracts Analysis", help="This bar graph ranks the census tracts with the lowest food access.")
+    st.write("🔍 **Sidebar:** Select County, Compare with Other Counties, Urban Tracts Only, and Median Income Range to explore.")
+    st.write("📈 **Chart:** Choose a metric, how many tracts to show and a view. Hover over each bar to view exact numbers and see which counties rank highest!")
+
+    # Create selection dropdowns
+    col1, col2, col3 = st.columns([2, 1, 2])
+    metric = col1.selectbox("Rank by:", options=[m for m in RANK_METRICS if m in df], format_func=RANK_METRICS.get)
+    top_n = col2.number_input("Tracts to show:", min_value=1, max_value=50, value=DEFAULT_TOP_N)
+    view_option = col3.selectbox(
+        "Select view:",
+        options=list(charts.TOP_TRACT_VIEWS),
+        index=0  # Default to first option
     )
-    st.write("Top 10 census tracts ranked from lowest to highest low-access population.")
-
-st.altair_chart(bar_chart, use_container_width=True)
-
-st.markdown(
-    f"""
-    <div style="background-color: #e6f3ff; padding: 1rem; border-radius: 0.5rem; text-align: left; color: #665c00; font-size: 16px;">
-        💡 Here we took the top 10 census tracts with the highest food inaccessibility to see how low it is in Masachusetts.
-        Census tracts with the highest food inaccessibility tend to be the areas we need to focus on the most. It can be seen that 
-        a county in Hampshire has the <strong>highest low access population<strong>, followed by Essex, 
-        another Hampshire county, and Worcester. <br>
-    </div>""", unsafe_allow_html=True)
-
-
+    caption, paged = charts.TOP_TRACT_VIEWS[view_option][2:]
+    label = RANK_METRICS[metric]
+    page = 1
+    if paged:
+        pages = top_tract_pages(filters, metric, top_n)
+        page = st.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1)
+    top_spec, top_tracts = top_tracts_data(filters, metric, top_n, view_option, page)
+    if not len(top_tracts):
+        st.info(f"No census tracts with a {label.lower()} value match the current filters. Widen the income range,"
+                " include rural tracts or choose other counties.")
+        return
+    with recorder.timer("top_tracts.chart_specs"):
+        top_vega = charts.vega_lite_spec(top_spec, top_tracts)
+    st.write(caption.format(n=top_n, label_lower=label.lower()))
+    recorder.vega_lite_chart(top_spec.kind, top_tracts, top_vega, width="stretch")
+
+    # Counties in rank order, so the takeaway follows the metric, N, page and filters
+    ranked = list(dict.fromkeys(top_tracts["County"].astype(str)))
+    county_list = ", ".join(ranked[:-1]) + (" and " if len(ranked) > 1 else "") + ranked[-1]
+    st.markdown(
+        f"""
+        <div style="background-color: #e6f3ff; padding: 1rem; border-radius: 0.5rem; text-align: left; color: #665c00; font-size: 16px;">
+            💡 Census tracts with the highest {label.lower()} tend to be the areas we need to focus on the most.
+            The top-ranked tract shown is in <strong>{ranked[0]} County</strong>, and the {len(top_tracts)} tracts
+            shown fall in {len(ranked)} {"county" if len(ranked) == 1 else "counties"}: {county_list}. <br>
+        </div>""", unsafe_allow_html=True)
+
+
+@st.fragment
+@recorder.section("map")
+def map_section(filters):
+    st.subheader("🗺️ Food Access Map", help="This choropleth map shows the counties based on the percentage of LILA,"
+                 " or individual census tracts by a chosen measure.")
+    st.write("🔍 **Sidebar:** Select County to explore.")
+    st.write("📈 **Chart:** Zoom in and out of the map to explore. Hover over each county or tract for more information.")
+
+    map_panel = st.expander("Show map", expanded=not LAZY_SECTIONS, key="map_open", on_change="rerun")
+    if not is_open(map_panel):
+        return
+    with map_panel:
+        col1, col2 = st.columns(2)
+        map_level = col1.radio("Map level:", ["Counties", "Census tracts"], horizontal=True)
+        if map_level == "Census tracts":
+            tract_metric = col2.selectbox("Color tracts by:", options=list(analytics.TRACT_MAP_METRICS),
+                                          format_func=lambda m: analytics.TRACT_MAP_METRICS[m][0])
+            if geo_store.has_tract_geometry(state_fips):
+                with recorder.timer("map.figure"):
+                    fig = tract_map_figure(data_version, section_key("map", filters), tract_metric, selected_state, df)
+                recorder.plotly_chart("tract_map", fig, width="stretch")
+            else:
+                st.info(f"No tract geometry for {selected_state} yet. Build it from a local Census tract file with"
+                        f" `python geo_store.py --state {state_fips} --tracts --source <tracts .geojson/.shp/.zip>`.")
+        elif geo_store.county_geometry_path(state_fips).exists():
+            with recorder.timer("map.figure"):
+                fig = map_figure(data_version, artifacts_version, section_key("map", filters), selected_state, df, artifacts)
+            recorder.plotly_chart("map", fig, width="stretch")
+        else:
+            st.info(f"No county geometry for {selected_state} yet. Build it with"
+                    f" `python geo_store.py --state {state_fips}`.")
+
+        map_note = "Counties like Hampshire may show" if selected_state == "Massachusetts" else "Darker counties show"
+        st.markdown(
+            f"""
+            <div style="background-color: #fdecea; padding: 1rem; border-radius: 0.5rem; text-align: left; color: #611a15; font-size: 16px;">
+                💡 This map reveals that patterns of food access vary significantly across {selected_state}. {map_note}
+                <strong>higher rates of LILA tracts, signaling deeper food access challenges.</strong><br>
+            </div>""", unsafe_allow_html=True)
+
+
+@st.fragment
+@recorder.section("nearby")
+def nearby_section(filters):
+    st.subheader("📍 Nearby Tracts", help="Find the census tracts around one tract, by distance between tract"
+                 " centroids, and compare the tract with its neighborhood.")
+    st.write("🔍 **Sidebar:** Select County to start from one of its tracts.")
+    st.write("📈 **Chart:** Pick a tract, then a radius in miles or a number of nearest tracts.")
+
+    nearby_panel = st.expander("Show nearby tracts", expanded=not LAZY_SECTIONS, key="nearby_open", on_change="rerun")
+    if not is_open(nearby_panel):
+        return
+    with nearby_panel:
+        if not geo_store.has_tract_centroids(state_fips):
+            st.info(f"No tract centroids for {selected_state} yet. Build them from a local Census tract file with"
+                    f" `python geo_store.py --state {state_fips} --tracts --source <tracts .geojson/.shp/.zip>`.")
+            return
+        with recorder.timer("nearby.index"):
+            spatial_index = get_spatial_index(data_version, state_fips, df)
+            geoids, options, labels, first_in_county = nearby_tracts(data_version, state_fips, df, spatial_index)
+        default = first_in_county.get(filters["county"], 0)
+
+        col1, col2, col3 = st.columns([2, 1, 1])
+        tract = col1.selectbox("Tract:", options, index=default, format_func=labels.__getitem__)
+        mode = col2.radio("Find:", ["Within a radius", "Nearest tracts"])
+        if mode == "Within a radius":
+            radius = col3.slider("Radius (miles):", min_value=1, max_value=50, value=5)
+        else:
+            k = col3.number_input("Tracts:", min_value=1, max_value=100, value=10)
+        lila_only = st.checkbox("Low-income low-access (LILA) tracts only", value=False)
+
+        with recorder.timer("nearby.query"):
+            # The LILA filter goes into the search, so nearest mode still finds k tracts
+            allowed = df["LILATracts_1And10"].to_numpy() == 1 if lila_only else None
+            if mode == "Within a radius":
+                rows, miles = spatial_index.within(tract, radius, allowed)
+            else:
+                rows, miles = spatial_index.nearest(tract, k, allowed)
+            neighborhood = spatial_index.summary(rows)
+            own = spatial_index.summary([tract])
+
+        if not len(rows):
+            if mode == "Within a radius":
+                st.write("No tracts match. Widen the radius or include all tracts.")
+            else:
+                st.write(f"No other {'LILA ' if lila_only else ''}tracts in {selected_state} have a known location.")
+            return
+        st.write(f"**{len(rows):,} tracts** within {miles.max():,.1f} miles, home to {neighborhood['population']:,.0f} people.")
+        col1, col2, col3 = st.columns(3)
+        for col, label, field in [(col1, "Low-Access Population Share", "low_access_share"),
+                                  (col2, "Poverty Rate", "poverty_rate"),
+                                  (col3, "Share of LILA Tracts", "lila_share")]:
+            col.metric(f"{label} (this tract)", f"{own[field]:.1f}%",
+                       delta=f"{own[field] - neighborhood[field]:+.1f} pts vs. neighbors ({neighborhood[field]:.1f}%)",
+                       delta_color="inverse")
+
+        neighbors = df.take(rows)[["County", "Pop2010", "LowAccessPopulation", "PovertyRate", "LILATracts_1And10"]]
+        neighbors.insert(0, "Census Tract", geoids[rows])
+        neighbors.insert(2, "Distance (miles)", miles.round(2))
+        st.dataframe(neighbors.rename(columns={"Pop2010": "Population", "LowAccessPopulation": "Low-Access Population",
+                                               "PovertyRate": "Poverty Rate (%)", "LILATracts_1And10": "LILA"}),
+                     hide_index=True, width="stretch")
+
+
+@st.fragment
+@recorder.section("change")
+def change_section(filters):
+    selected_county = filters["county"]
+    st.subheader("📅 Change Over Time", help="Compares this Atlas with earlier Atlas vintages, tract by tract,"
+                 " with tracts that split or merged mapped onto today's tracts.")
+    st.write("🔍 **Sidebar:** Select County to highlight it and list its tracts.")
+    st.write("📈 **Chart:** Choose a measure and two Atlas years. Hover over each bar for the change in that county.")
+
+    change_panel = st.expander("Show change over time", expanded=not LAZY_SECTIONS, key="change_open", on_change="rerun")
+    if not is_open(change_panel):
+        return
+    with change_panel:
+        earlier = vintages.available()
+        if not earlier:
+            st.info("No earlier Atlas vintages yet. Add one from its Atlas CSV with"
+                    " `python vintages.py 2015 <atlas csv> [--relationship <tract relationship csv>]`.")
+            return
+        aligned = get_aligned_vintages(data_version, state_fips, vintages.catalog_key(), df)
+        years = [vintages.BASE_VINTAGE] + earlier
+
+        col1, col2, col3 = st.columns([2, 1, 1])
+        metric = col1.selectbox("Measure:", options=[m for m in vintages.METRICS if m in df],
+                                format_func=lambda m: vintages.METRICS[m][0])
+        old = col2.selectbox("From:", years, index=1)
+        new = col3.selectbox("To:", years, index=0)
+        if old == new:
+            st.write("Pick two different years to compare.")
+            return
+        label, how = vintages.METRICS[metric]
+
+        with recorder.timer("change.delta"):
+            by_county = aligned.county_delta(metric, old, new)
+            delta = aligned.tract_delta(metric, old, new)
+        recorder.cache("vintages", aligned)
+        if by_county.empty:
+            st.write(f"No tracts in {selected_state} can be compared between {old} and {new}.")
+            return
+
+        compared = int(by_county["Tracts"].sum())
+        if how == "sum":
+            st.write(f"Across {compared:,} comparable tracts, {label.lower()} went from {by_county[old].sum():,.0f}"
+                     f" in {old} to {by_county[new].sum():,.0f} in {new}.")
+        else:
+            st.write(f"Across {compared:,} comparable tracts, {label} changed by {np.nanmean(delta):+,.2f}"
+                     f" in the average tract from {old} to {new}.")
+
+        change_title = f"Change in {label}" + (" (county total)" if how == "sum" else " (county average)")
+        change_spec = charts.ChartSpec("county_change", f"{change_title}, {old} to {new}",
+                                       highlight_county=selected_county, value_title=f"Change in {label}")
+        change_data = by_county[["County", "Change", "Tracts"]]
+        with recorder.timer("change.chart_specs"):
+            change_vega = charts.vega_lite_spec(change_spec, change_data)
+        recorder.vega_lite_chart(change_spec.kind, change_data, change_vega, width="stretch")
+
+        # Tracts that moved most, within the selected county if there is one
+        rows = np.flatnonzero(~np.isnan(delta))
+        if selected_county != "All":
+            rows = rows[(df["County"].to_numpy()[rows] == selected_county)]
+        top = rows[np.argsort(-np.abs(delta[rows]), kind="stable")[:10]]
+        place = selected_state if selected_county == "All" else f"{selected_county} County"
+        st.write(f"**Largest tract changes in {place}**")
+        movers = df.take(top)[["County"]]
+        movers.insert(0, "Census Tract", analytics.tract_geoids(df.take(top)).to_numpy())
+        movers[old] = aligned.values(old, metric)[top]
+        movers[new] = aligned.values(new, metric)[top]
+        movers["Change"] = delta[top]
+        st.dataframe(movers, hide_index=True, width="stretch")
+
+
+# Warm-up threads outlive the run that started them, so they never time into its recorder
+warmup_recorder = perf.Recorder(False)
+
+
+def warm_relationships(filters):
+    scatter_spec, scatter_data, vehicle_spec, vehicle_data = relationships_data(filters, warmup_recorder)
+    charts.vega_lite_spec(scatter_spec, scatter_data)
+    charts.vega_lite_spec(vehicle_spec, vehicle_data)
+
+
+def warm_top_tracts(filters, view_option):
+    metric = next(m for m in RANK_METRICS if m in df)
+    if charts.TOP_TRACT_VIEWS[view_option][3]:
+        top_tract_pages(filters, metric, DEFAULT_TOP_N)
+    top_spec, top_tracts = top_tracts_data(filters, metric, DEFAULT_TOP_N, view_option, recorder=warmup_recorder)
+    charts.vega_lite_spec(top_spec, top_tracts)
+
+
+def warmup_scopes():
+    """Scopes to warm: "All", then the counties with the most tracts, as many as stay cached."""
+    # Each warmed scope keeps one top tracts spec per view, one map figure and at most one
+    # binned scatter; warm views may fill half of each cache, the rest is for live sessions
+    fit = min(charts.chart_cache.maxsize // len(charts.TOP_TRACT_VIEWS), MAP_FIGURE_ENTRIES,
+              SCATTER_BINS_ENTRIES) // 2
+    tracts = df["County"].value_counts()
+    counties = list(tracts[tracts > 0].index)
+    if len(counties) > fit - 1:
+        warmup.logger.info("warm-up %s: warming the %d largest of %d counties",
+                           selected_state, fit - 1, len(counties))
+    return ["All"] + counties[:fit - 1]
+
+
+def warmup_stages():
+    """This state's warm-up: indexes, geometry and libraries first, then the views of each warm scope."""
+    has_counties = geo_store.county_geometry_path(state_fips).exists()
+    load = [
+        ("filter index", functools.partial(get_filter_index, data_version, df)),
+        ("ranking index", functools.partial(get_ranking_index, data_version, df)),
+    ]
+    if has_counties:
+        load.append(("county geometry", functools.partial(geo_store.load_county_geometry, state_fips)))
+        load.append(("plotly", functools.partial(importlib.import_module, "plotly.graph_objects")))
+    if geo_store.has_tract_geometry(state_fips):
+        load += [(f"tract geometry ({level})", functools.partial(geo_store.load_tract_geometry, state_fips, level))
+                 for level in geo_store.TRACT_LEVELS]
+    if geo_store.has_tract_centroids(state_fips):
+        load.append(("spatial index", functools.partial(get_spatial_index, data_version, state_fips, df)))
+
+    # The sidebar's starting filters, with each county in turn
+    views = []
+    for scope in warmup_scopes():
+        scope_filters = {"state": state_fips, "county": scope, "compare": (), "urban": False,
+                         "income": (income_min, income_max)}
+        views.append((f"{scope}: relationships", functools.partial(warm_relationships, scope_filters)))
+        views += [(f"{scope}: {view_option}", functools.partial(warm_top_tracts, scope_filters, view_option))
+                  for view_option in charts.TOP_TRACT_VIEWS]
+        if has_counties:
+            views.append((f"{scope}: map", functools.partial(
+                map_figure, data_version, artifacts_version, section_key("map", scope_filters), selected_state, df,
+                artifacts)))
+    return [("load", load), ("views", views)]
+
+
+# One warm-up per server process and dataset version, started once the first run that
+# needs it has drawn the page. Sessions never wait for it; anything not warm yet is
+# computed on demand.
+@st.cache_resource(max_entries=16, show_spinner=False)
+def start_warmup(version):
+    return warmup.Warmup(selected_state, warmup_stages())
+
+
+relationships_section(filters)
 st.markdown("---")
-
-# Chart 4: Map
-import plotly.graph_objects as go
-import requests
-
-county_fips = {
-    "Barnstable": "25001", "Berkshire": "25003", "Bristol": "25005", "Dukes": "25007",
-    "Essex": "25009", "Franklin": "25011", "Hampden": "25013", "Hampshire": "25015",
-    "Middlesex": "25017", "Nantucket": "25019", "Norfolk": "25021", "Plymouth": "25023",
-    "Suffolk": "25025", "Worcester": "25027"}
-
-county_summary = df.groupby("County", as_index=False).agg({
-    "LILATracts_1And10": "sum",
-    "CensusTract": "count",
-    "Pct_Households_No_Vehicle": "mean",
-    "MedianFamilyIncome": "mean",
-    "PovertyRate": "mean"})
-
-county_summary["% LILA Tracts"] = (
-    county_summary["LILATracts_1And10"] / county_summary["CensusTract"]) * 100
-county_summary = county_summary.round(2)
-county_summary.rename(columns={
-    "MedianFamilyIncome": "Median Family Income ($)",
-    "PovertyRate": "Poverty Rate (%)",
-    "Pct_Households_No_Vehicle": "% Without Vehicle",
-}, inplace=True)
-county_summary["fips"] = county_summary["County"].map(county_fips)
-
-for island in ["Dukes", "Nantucket"]:
-    if island not in county_summary["County"].values:
-        county_summary = county_summary.append({
-            "County": island,
-            "LILATracts_1And10": 0,
-            "CensusTract": 1,
-            "% LILA Tracts": 0,
-            "Median Family Income ($)": 0,
-            "Poverty Rate (%)": 0,
-            "% Without Vehicle": 0,
-            "fips": county_fips[island]
-        }, ignore_index=True)
-
-geo_url = "https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json"
-geo_json = requests.get(geo_url).json()
-geo_json["features"] = [f for f in geo_json["features"] if f["id"].startswith("25")]
-
-choropleth = go.Choropleth(
-    geojson=geo_json,
-    locations=county_summary["fips"],
-    z=county_summary["% LILA Tracts"],
-    colorscale="Reds",
-    zmin=0,
-    zmax=county_summary["% LILA Tracts"].max(),
-    marker_line_color="black",
-    marker_line_width=0.5,
-    featureidkey="id",
-    colorbar_title="% LILA Tracts",
-    text=county_summary.apply(
-        lambda row: (
-            f"County: {row['County']}<br>"
-            f"% LILA Tracts: {row['% LILA Tracts']:.2f}<br>"
-            f"Median Income: ${row['Median Family Income ($)']:,.0f}<br>"
-            f"Poverty Rate (%): {row['Poverty Rate (%)']:.2f}<br>"
-            f"% Without Vehicle: {row['% Without Vehicle']:.2f}"
-        ), axis=1),
-    hovertemplate="%{text}<extra></extra>")
-
-highlight = None
-if selected_county != "All" and selected_county in county_fips:
-    selected_fips = county_fips[selected_county]
-    selected_feature = next((f for f in geo_json["features"] if f["id"] == selected_fips), None)
-    if selected_feature:
-        highlight = go.Choropleth(
-            geojson={"type": "FeatureCollection", "features": [selected_feature]},
-            locations=[selected_fips],
-            z=[0],
-            colorscale=[[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
-            showscale=False,
-            marker_line_color="black",
-            marker_line_width=2.8,
-            featureidkey="id",
-            hoverinfo="skip")
-
-fig = go.Figure(data=[choropleth] + ([highlight] if highlight else []))
-fig.update_geos(fitbounds="locations", visible=False)
-fig.update_layout(
-    title="Percentage of Low-Income Low-Access (LILA) Tracts by Massachusetts County",
-    margin={"r": 0, "t": 50, "l": 0, "b": 0})
-
-st.subheader("🗺️ Food Access Map", help="This choropleth map shows the counties based on the percentage of LILA.")
-st.write("🔍 **Sidebar:** Select County to explore.")
-st.write("📈 **Chart:** Zoom in and out of the map to explore. Hover over each county for more information.")
-st.plotly_chart(fig, use_container_width=True)
-
-st.markdown(
-    f"""
-    <div style="background-color: #fdecea; padding: 1rem; border-radius: 0.5rem; text-align: left; color: #611a15; font-size: 16px;">
-        💡 This map reveals that patterns of food access vary significantly across Massachusetts. Counties like Hampshire 
-        may show <strong>higher rates of LILA tracts, signaling deeper food access challenges.<strong><br>
-    </div>""", unsafe_allow_html=True)
-
-
+top_tracts_section(filters)
+st.markdown("---")
+map_section(filters)
+st.markdown("---")
+nearby_section(filters)
+st.markdown("---")
+change_section(filters)
 st.markdown("---")
 
-# Key Takeaways Section 
-st.subheader("📌 Key Takeaways and Reflections")
-
-tab1, tab2, tab3, tab4 = st.tabs(["Summary", "Health Impacts", "Policy Recommendations", "Beyond MA + Action"])
-
-with tab1:
-    st.markdown("""
-### 💡 Summary of Insights
-- Tracts with **low median family income** and **high poverty rates** are often also classified as Low-Income and Low Access (LILA).
-- Lack of **vehicle access** adds another layer of difficulty in accessing grocery stores, especially in these high-need communities.
-- The **top 10 most food-inaccessible tracts** span multiple counties, revealing that this is not just an urban or rural issue – it's widespread.
-
-📢 This is a **statewide and national challenge** with real public health and equity implications.
-    """)
-
-with tab2:
-    st.markdown("""
-### 🩺 Health Implications
-Food insecurity contributes to:
-- **Higher rates of chronic disease** (e.g. diabetes, hypertension, cardiovascular disease, obesity) from reliance on processed, 
-                high-calorie food options that provide sustenance but lack essential nutrients.
-- Poor **mental health outcomes**, increased rates of depression, anxiety, and stress-related disorders due to chronic stress over food insecurity.
-- **Increased healthcare costs** and systemic strain as there would be an increase in emergency room visits, hospital readmissions, and long term 
-                care needs, especially in underserved regions.
-    """)
-
-with tab3:
-    st.markdown("""
-### 🏛️ Policy & Equity Recommendations
-
-**Actionable data like this dashboard** should inform equity-centered urban and rural planning.
-- Incentivize **grocery store development** in underserved tracts.
-- Fund **transportation programs** for low-income and vehicle-less communities.
-- Scale up **SNAP (Supplemental Nutrition Assistance Program) access and outreach** in low-access regions.
-- Remove **zoning barriers** to allow mobile and pop-up grocery markets.
-- Encourage **cross-department collaboration** between health, transit, housing, and food agencies.
-    """)
-
-with tab4:
-    st.markdown("""
-### 🌎 Beyond Massachusetts + Call to Action
-
-- While this dashboard focuses on Massachusetts, similar patterns exist nationwide.
--  A more just food system means confronting transportation, poverty, zoning laws, 
-                and health disparities together.
-- 📣 **What You Can Do**:
-    - Vote and advocate for **policies that support food justice**.
-    - Partner with or volunteer for **local mutual aid groups and food co-ops**.
-    - Use and share tools like this dashboard to **inform others and drive action**.
-    """)
+# Key Takeaways Section
+@st.fragment
+@recorder.section("takeaways")
+def takeaways_section():
+    st.subheader("📌 Key Takeaways and Reflections")
+
+    # Only the selected tab's content is built and sent
+    tab1, tab2, tab3, tab4 = st.tabs(["Summary", "Health Impacts", "Policy Recommendations", f"Beyond {'MA' if selected_state == 'Massachusetts' else selected_state} + Action"],
+                                     key="takeaways", on_change="rerun")
+
+    if is_open(tab1):
+        tab1.markdown("""
+    ### 💡 Summary of Insights
+    - Tracts with **low median family income** and **high poverty rates** are often also classified as Low-Income and Low Access (LILA).
+    - Lack of **vehicle access** adds another layer of difficulty in accessing grocery stores, especially in these high-need communities.
+    - The **top 10 most food-inaccessible tracts** span multiple counties, revealing that this is not just an urban or rural issue – it's widespread.
+
+    📢 This is a **statewide and national challenge** with real public health and equity implications.
+        """)
+
+    if is_open(tab2):
+        tab2.markdown("""
+    ### 🩺 Health Implications
+    Food insecurity contributes to:
+    - **Higher rates of chronic disease** (e.g. diabetes, hypertension, cardiovascular disease, obesity) from reliance on processed, 
+                    high-calorie food options that provide sustenance but lack essential nutrients.
+    - Poor **mental health outcomes**, increased rates of depression, anxiety, and stress-related disorders due to chronic stress over food insecurity.
+    - **Increased healthcare costs** and systemic strain as there would be an increase in emergency room visits, hospital readmissions, and long term 
+                    care needs, especially in underserved regions.
+        """)
+
+    if is_open(tab3):
+        tab3.markdown("""
+    ### 🏛️ Policy & Equity Recommendations
+
+    **Actionable data like this dashboard** should inform equity-centered urban and rural planning.
+    - Incentivize **grocery store development** in underserved tracts.
+    - Fund **transportation programs** for low-income and vehicle-less communities.
+    - Scale up **SNAP (Supplemental Nutrition Assistance Program) access and outreach** in low-access regions.
+    - Remove **zoning barriers** to allow mobile and pop-up grocery markets.
+    - Encourage **cross-department collaboration** between health, transit, housing, and food agencies.
+        """)
+
+    if is_open(tab4):
+        tab4.markdown(f"""
+    ### 🌎 Beyond {selected_state} + Call to Action
+
+    - While this dashboard focuses on {selected_state}, similar patterns exist nationwide.
+    -  A more just food system means confronting transportation, poverty, zoning laws, 
+                    and health disparities together.
+    - 📣 **What You Can Do**:
+        - Vote and advocate for **policies that support food justice**.
+        - Partner with or volunteer for **local mutual aid groups and food co-ops**.
+        - Use and share tools like this dashboard to **inform others and drive action**.
+        """)
+
+
+takeaways_section()
+
+if warmup.ENABLED:
+    warm_progress = start_warmup(data_version).progress()
+    recorder.context["warmup"] = warm_progress
+    if not warm_progress["finished"]:
+        st.sidebar.caption(f"⏳ Preparing {selected_state} views in the background: {warm_progress['done']}"
+                           f"/{warm_progress['total']} ({warm_progress['elapsed_s']:.1f} s)")
+
+recorder.cache("chart_specs", charts.chart_cache)
+recorder.finish()
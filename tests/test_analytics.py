@@ -0,0 +1,47 @@
+"""County summary for the map when geometry and data name counties differently."""
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import geo_store  # noqa: E402
+import precompute  # noqa: E402
+
+
+@pytest.fixture
+def louisiana_geometry(tmp_path, monkeypatch):
+    # The geometry store uses bare names; the Atlas says "Parish"
+    features = [{"type": "Feature", "id": fips, "properties": {"NAME": name}, "geometry": None}
+                for name, fips in [("Orleans", "22071"), ("Jefferson", "22051"), ("Cameron", "22023")]]
+    (tmp_path / "counties_22.geojson").write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    monkeypatch.setattr(geo_store, "GEO_DIR", tmp_path)
+    geo_store.load_county_geometry.cache_clear()
+    yield
+    geo_store.load_county_geometry.cache_clear()
+
+
+def test_parish_names_get_one_row_per_fips(louisiana_geometry):
+    df = pd.DataFrame({
+        "County": ["Orleans Parish", "Orleans Parish", "Jefferson Parish"],
+        "CountyFIPS": ["22071", "22071", "22051"],
+        "CensusTract": [22071000100, 22071000200, 22051000100],
+        "LILATracts_1And10": [1, 1, 0],
+        "Pct_Households_No_Vehicle": [30.0, 20.0, 10.0],
+        "MedianFamilyIncome": [40000.0, 50000.0, 60000.0],
+        "PovertyRate": [25.0, 15.0, 10.0],
+    })
+    summary = analytics.county_summary(df, precompute.state_county_fips(df, "22"))
+
+    assert summary["fips"].is_unique
+    assert sorted(summary["fips"]) == ["22023", "22051", "22071"]
+    by_fips = summary.set_index("fips")
+    assert by_fips.loc["22071", "County"] == "Orleans Parish"
+    assert by_fips.loc["22071", "% LILA Tracts"] == 100.0
+    # Counties with no tracts in the data still get a (zero) row
+    assert by_fips.loc["22023", "County"] == "Cameron"
+    assert by_fips.loc["22023", "% LILA Tracts"] == 0.0
@@ -0,0 +1,44 @@
+"""Binned scatter: one cell per income/poverty bin across counties, plus the highlight overlay."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chart_data  # noqa: E402
+
+
+def tracts(n=5000, counties=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "County": [f"County {i}" for i in rng.integers(0, counties, n)],
+        "Pop2010": rng.integers(500, 8000, n).astype("float64"),
+        "PovertyRate": rng.uniform(0, 40, n),
+        "MedianFamilyIncome": rng.uniform(20000, 200000, n),
+    })
+
+
+def test_cells_total_every_county():
+    df = tracts()
+    bins = chart_data.scatter_bins(df, bins=20)
+    assert not bins["Selected"].any()
+    assert not bins.duplicated(["income_lo", "poverty_lo"]).any()
+    assert len(bins) <= 20 * 20
+    assert bins["Tracts"].sum() == len(df)
+    assert np.isclose(bins["Pop2010"].sum(), df["Pop2010"].sum())
+
+
+def test_highlight_overlay_covers_only_that_county():
+    df = tracts()
+    bins = chart_data.scatter_bins(df, bins=20, highlight="County 7")
+    selected = bins[bins["Selected"]]
+    county = df[df["County"] == "County 7"]
+    assert selected["Tracts"].sum() == len(county)
+    assert np.isclose(selected["Pop2010"].sum(), county["Pop2010"].sum())
+    assert bins.loc[~bins["Selected"], "Tracts"].sum() == len(df)
+
+    # Nothing to overlay when the selection is that county alone
+    alone = chart_data.scatter_bins(county, bins=20, highlight="County 7")
+    assert not alone["Selected"].any()
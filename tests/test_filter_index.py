@@ -0,0 +1,77 @@
+"""FilterIndex.select against the original pandas masks over random sidebar states."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filter_index import FilterIndex  # noqa: E402
+
+COUNTIES = ["Barnstable", "Berkshire", "Essex", "Hampden", "Hampshire", "Suffolk", "Worcester"]
+
+
+@pytest.fixture(scope="module")
+def tracts():
+    rng = np.random.default_rng(0)
+    n = 3000
+    # Whole-dollar incomes so slider bounds often land exactly on a tract's value
+    income = rng.integers(10000, 250000, n).astype("float64")
+    income[rng.random(n) < 0.03] = np.nan
+    urban = pd.array(rng.integers(0, 2, n), dtype="Int64")
+    urban[rng.random(n) < 0.02] = pd.NA
+    county = rng.choice(COUNTIES, n).astype(object)
+    county[rng.random(n) < 0.01] = None
+    return pd.DataFrame({"County": county, "Urban": urban, "MedianFamilyIncome": income})
+
+
+def baseline(df, selected_county, selected_counties, urban_only, income_range):
+    """The dashboard's filter before FilterIndex, as row positions."""
+    filtered = df.copy()
+    if selected_county != "All" and selected_counties:
+        all_counties = [selected_county] + selected_counties
+        filtered = filtered[filtered["County"].isin(all_counties)]
+    elif selected_county != "All":
+        filtered = filtered[filtered["County"] == selected_county]
+    elif selected_counties:
+        filtered = filtered[filtered["County"].isin(selected_counties)]
+    if urban_only: filtered = filtered[filtered["Urban"] == 1]
+    filtered = filtered[(filtered["MedianFamilyIncome"] >= income_range[0]) &
+                        (filtered["MedianFamilyIncome"] <= income_range[1])]
+    return df.index.get_indexer(filtered.index)
+
+
+def random_state(rng, df):
+    selected_county = rng.choice(["All"] + COUNTIES + ["Nantucket"])
+    selected_counties = list(rng.choice(COUNTIES + ["Nantucket"], rng.integers(0, 4)))
+    income = df["MedianFamilyIncome"].dropna().to_numpy()
+    income_min, income_max = int(income.min()), int(income.max())
+    if rng.random() < 0.2:
+        income_range = (income_min, income_max)
+    elif rng.random() < 0.5:
+        income_range = tuple(sorted(int(v) for v in rng.choice(income, 2)))
+    else:
+        income_range = tuple(sorted(int(v) for v in rng.integers(income_min, income_max + 1, 2)))
+    return selected_county, selected_counties, bool(rng.random() < 0.5), income_range
+
+
+def test_select_matches_pandas_masks(tracts):
+    index = FilterIndex(tracts, cache_size=32)
+    rng = np.random.default_rng(1)
+    for _ in range(500):
+        state = random_state(rng, tracts)
+        rows = index.select(*state)
+        assert rows.tolist() == baseline(tracts, *state).tolist(), state
+    assert index.misses > index.hits
+
+
+def test_cached_select_is_read_only(tracts):
+    index = FilterIndex(tracts)
+    state = ("Suffolk", ["Essex"], True, (30000, 120000))
+    rows = index.select(*state)
+    assert index.select(*state) is rows
+    assert index.hits == 1 and index.misses == 1
+    with pytest.raises(ValueError):
+        rows[0] = 0
@@ -0,0 +1,53 @@
+"""RankingIndex.top against a plain pandas sort of the same selection."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranking import RankingIndex  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def tracts():
+    rng = np.random.default_rng(0)
+    n = 2000
+    values = rng.integers(0, 50, n).astype("float64")
+    values[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        "County": rng.choice(["Essex", "Hampden", "Suffolk", "Worcester"], n),
+        "LowAccessPopulation": values,
+        "Urban": rng.integers(0, 2, n),
+    })
+
+
+def expected(df, metric, rows, n, offset=0):
+    selected = df.iloc[rows]
+    ranked = selected[metric].dropna().sort_values(ascending=False, kind="stable")
+    return selected.index.get_indexer(ranked.index[offset:offset + n]).tolist()
+
+
+@pytest.mark.parametrize("counties", [None, ["Suffolk"], ["Suffolk", "Essex"], ["Suffolk", "Suffolk"],
+                                      ["Essex", "Suffolk", "Essex"]])
+@pytest.mark.parametrize("offset", [0, 10, 250])
+def test_top_matches_sort_values(tracts, counties, offset):
+    index = RankingIndex(tracts)
+    mask = tracts["Urban"].to_numpy() == 1
+    if counties:
+        mask &= tracts["County"].isin(counties).to_numpy()
+    rows = np.flatnonzero(mask)
+
+    top = index.top("LowAccessPopulation", rows, n=10, offset=offset, counties=counties)
+
+    assert len(set(top.tolist())) == len(top)
+    assert np.searchsorted(rows, top).tolist() == expected(tracts, "LowAccessPopulation", rows, 10, offset)
+
+
+def test_top_matches_nlargest(tracts):
+    index = RankingIndex(tracts)
+    rows = np.arange(len(tracts))
+    top = index.top("LowAccessPopulation", rows, n=25)
+    assert top.tolist() == tracts["LowAccessPopulation"].nlargest(25).index.tolist()
@@ -0,0 +1,97 @@
+"""SpatialIndex radius and nearest queries against brute-force haversine distances."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial_index import EARTH_RADIUS_MILES, SpatialIndex  # noqa: E402
+
+
+def haversine_miles(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture(scope="module")
+def tracts():
+    rng = np.random.default_rng(0)
+    n = 3000
+    df = pd.DataFrame({
+        "CensusTract": 25000000000 + np.arange(n) * 100,
+        "Pop2010": rng.integers(500, 8000, n).astype("float64"),
+        "LowAccessPopulation": rng.integers(0, 3000, n).astype("float64"),
+        "LILATracts_1And10": rng.integers(0, 2, n),
+        "PovertyRate": rng.uniform(0, 40, n),
+    })
+    # A state-sized box, with a few tracts missing from the centroid file
+    centroids = pd.DataFrame({
+        "GEOID": df["CensusTract"].astype(str).str.zfill(11),
+        "lon": rng.uniform(-73.5, -69.9, n),
+        "lat": rng.uniform(41.2, 42.9, n),
+    }).drop(index=[5, 17, 400])
+    return df, centroids.reset_index(drop=True)
+
+
+def brute_force(df, centroids, row):
+    located = pd.Index(centroids["GEOID"]).get_indexer(df["CensusTract"].astype(str).str.zfill(11))
+    rows = np.flatnonzero(located >= 0)
+    lon, lat = centroids["lon"].to_numpy()[located[rows]], centroids["lat"].to_numpy()[located[rows]]
+    own = located[row]
+    miles = haversine_miles(centroids["lon"].iloc[own], centroids["lat"].iloc[own], lon, lat)
+    keep = rows != row
+    rows, miles = rows[keep], miles[keep]
+    order = np.argsort(miles, kind="stable")
+    return rows[order], miles[order]
+
+
+@pytest.mark.parametrize("row", [0, 1234, 2999])
+@pytest.mark.parametrize("radius", [1, 5, 25])
+def test_within_matches_haversine(tracts, row, radius):
+    df, centroids = tracts
+    index = SpatialIndex(df, centroids, leaf_size=16)
+    rows, miles = index.within(row, radius)
+    expected_rows, expected_miles = brute_force(df, centroids, row)
+    inside = expected_miles <= radius
+    assert set(rows.tolist()) == set(expected_rows[inside].tolist())
+    np.testing.assert_allclose(miles, np.sort(expected_miles[inside]), atol=1e-6)
+
+
+@pytest.mark.parametrize("row", [0, 1234, 2999])
+@pytest.mark.parametrize("k", [1, 10, 100])
+def test_nearest_matches_haversine(tracts, row, k):
+    df, centroids = tracts
+    index = SpatialIndex(df, centroids, leaf_size=16)
+    rows, miles = index.nearest(row, k)
+    expected_rows, expected_miles = brute_force(df, centroids, row)
+    assert len(rows) == k
+    np.testing.assert_allclose(miles, expected_miles[:k], atol=1e-6)
+    assert set(rows.tolist()) <= set(expected_rows[expected_miles <= expected_miles[k - 1] + 1e-9].tolist())
+
+
+@pytest.mark.parametrize("k", [5, 50])
+def test_nearest_with_mask_finds_k_allowed(tracts, k):
+    df, centroids = tracts
+    index = SpatialIndex(df, centroids, leaf_size=16)
+    allowed = df["LILATracts_1And10"].to_numpy() == 1
+    rows, miles = index.nearest(1234, k, allowed)
+    expected_rows, expected_miles = brute_force(df, centroids, 1234)
+    expected_miles = expected_miles[allowed[expected_rows]]
+    assert len(rows) == k
+    assert allowed[rows].all()
+    np.testing.assert_allclose(miles, expected_miles[:k], atol=1e-6)
+
+    within_rows, _ = index.within(1234, 10, allowed)
+    assert allowed[within_rows].all()
+    assert len(within_rows) == np.count_nonzero(expected_miles <= 10)
+
+
+def test_tracts_without_centroid_are_left_out(tracts):
+    df, centroids = tracts
+    index = SpatialIndex(df, centroids)
+    assert len(index) == len(df) - 3
+    assert 17 not in index and 18 in index
@@ -0,0 +1,234 @@
+"""Earlier Food Access Research Atlas vintages, aligned to the current tracts.
+
+The dashboard's own data is the base vintage (``FOOD_ACCESS_BASE_VINTAGE``,
+2019 by default). Each earlier vintage is built once from its Atlas CSV:
+
+    python vintages.py 2015 atlas_2015.csv [--relationship tract_relationship.csv]
+
+The comparable metrics are re-keyed onto the base vintage's ``CensusTract``
+codes and written as one memory-mappable Arrow file per state under
+``data/vintages/<vintage>/``. Tracts that split or merged between the two
+geographies are mapped through the relationship file. That is a CSV with
+``FromTract`` (the vintage's tract), ``ToTract`` (the base tract) and an
+optional ``Weight``, the share of the from-tract that falls in the to-tract
+(e.g. its population share from the Census tract relationship file). Counts
+are apportioned by weight and rates averaged by the population they cover.
+Tracts not in the file keep their code.
+
+``AlignedVintages`` holds one state's metrics as float arrays in the row order
+of the base partition. It loads a vintage only when it is first compared. A
+comparison is then one array subtraction, and county deltas are one
+``bincount``.
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import partition_store
+
+VINTAGE_DIR = Path(os.environ.get("FOOD_ACCESS_VINTAGE_DIR", Path(__file__).parent / "data" / "vintages"))
+BASE_VINTAGE = os.environ.get("FOOD_ACCESS_BASE_VINTAGE", "2019")
+MANIFEST = "manifest.json"
+
+# Comparable metric -> (label, how values combine when tracts split or merge).
+# "sum" metrics are counts: apportioned by weight, added up per county. "mean" metrics
+# are rates: population-weighted where tracts merge, averaged per county.
+METRICS = {
+    "LowAccessPopulation": ("Low-Access Population", "sum"),
+    "lapop1": ("Low-Access Population (1 mile)", "sum"),
+    "lalowi10": ("Low-Income Low-Access Population (10 miles)", "sum"),
+    "TractHUNV": ("Households Without a Vehicle", "sum"),
+    "LILATracts_1And10": ("LILA Tracts", "mean"),
+    "PovertyRate": ("Poverty Rate (%)", "mean"),
+    "MedianFamilyIncome": ("Median Family Income ($)", "mean"),
+    "Pct_Households_No_Vehicle": ("% Households Without Vehicle", "mean"),
+}
+
+# Population used to weight rates when tracts merge
+WEIGHT_COLUMN = "Pop2010"
+
+
+def _state_path(vintage_dir, state_fips):
+    return vintage_dir / f"state={state_fips}" / "tracts.arrow"
+
+
+def available():
+    """Built vintages, newest first, excluding the base vintage."""
+    if not VINTAGE_DIR.exists():
+        return []
+    built = [p.name for p in VINTAGE_DIR.iterdir() if (p / MANIFEST).exists() and p.name != BASE_VINTAGE]
+    return sorted(built, reverse=True)
+
+
+def catalog_key():
+    """Changes whenever a vintage is built or rebuilt; use it to key caches of ``AlignedVintages``."""
+    return tuple((v, (VINTAGE_DIR / v / MANIFEST).stat().st_mtime_ns) for v in available())
+
+
+def read_manifest(vintage):
+    with open(VINTAGE_DIR / vintage / MANIFEST) as fh:
+        return json.load(fh)
+
+
+def read_relationship(path):
+    rel = pd.read_csv(path, dtype={"FromTract": "int64", "ToTract": "int64"})
+    if "Weight" not in rel:
+        # Without weights a split tract is shared evenly between its parts
+        rel["Weight"] = 1 / rel.groupby("FromTract")["FromTract"].transform("size")
+    return rel[["FromTract", "ToTract", "Weight"]]
+
+
+def realign(df, relationship=None):
+    """Metrics of one vintage re-keyed onto base ``CensusTract`` codes."""
+    metrics = [m for m in METRICS if m in df]
+    values = df[["CensusTract"] + metrics + ([WEIGHT_COLUMN] if WEIGHT_COLUMN in df else [])]
+    values = values.astype({c: "float64" for c in values.columns if c != "CensusTract"})
+    if relationship is None:
+        return values[["CensusTract"] + metrics]
+
+    unmapped = values.loc[~values["CensusTract"].isin(relationship["FromTract"]), "CensusTract"]
+    rel = pd.concat([relationship, pd.DataFrame({"FromTract": unmapped, "ToTract": unmapped, "Weight": 1.0})],
+                    ignore_index=True)
+    parts = rel.merge(values, left_on="FromTract", right_on="CensusTract")
+    weight = parts["Weight"].to_numpy()
+    population = parts[WEIGHT_COLUMN].fillna(0).to_numpy() * weight if WEIGHT_COLUMN in parts else weight
+    groups = parts["ToTract"]
+
+    out = {}
+    for metric in metrics:
+        x = parts[metric].to_numpy()
+        valid = ~np.isnan(x)
+        if METRICS[metric][1] == "sum":
+            total = pd.Series(np.where(valid, x * weight, 0.0)).groupby(groups).sum()
+            covered = pd.Series(valid).groupby(groups).any()
+            out[metric] = total.where(covered)
+        else:
+            w = np.where(valid, population, 0.0)
+            out[metric] = (pd.Series(np.where(valid, x * w, 0.0)).groupby(groups).sum() /
+                           pd.Series(w).groupby(groups).sum())
+    return pd.DataFrame(out).rename_axis("CensusTract").reset_index()
+
+
+def build_vintage(vintage, source, relationship=None):
+    """Align one Atlas vintage to the base tracts and write it per state. Returns the manifest."""
+    df = data_store.load_tracts(source)
+    rel = read_relationship(relationship) if relationship else None
+    aligned = realign(df, rel)
+
+    # Written under a staging name and swapped in, so readers never see a partial vintage
+    staging = VINTAGE_DIR / f".{vintage}.tmp-{os.getpid()}"
+    state_fips = (aligned["CensusTract"] // 1_000_000_000).astype("int64").astype(str).str.zfill(2)
+    for fips, part in aligned.groupby(state_fips, sort=True):
+        path = _state_path(staging, fips)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partition_store.write_arrow(part.reset_index(drop=True), path)
+    manifest = {
+        "vintage": vintage,
+        "source": str(source),
+        "source_version": data_store.source_version(source),
+        "relationship": str(relationship) if relationship else None,
+        "metrics": [m for m in METRICS if m in aligned],
+        "states": sorted(set(state_fips)),
+    }
+    with open(staging / MANIFEST, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    target = VINTAGE_DIR / vintage
+    if target.exists():
+        retired = VINTAGE_DIR / f".{vintage}.old-{os.getpid()}"
+        os.replace(target, retired)
+        os.replace(staging, target)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.replace(staging, target)
+    return manifest
+
+
+def load_vintage(vintage, state_fips):
+    """Aligned metrics of ``vintage`` for one state (memory-mapped), or None if it has no tracts there."""
+    path = _state_path(VINTAGE_DIR / vintage, state_fips)
+    return partition_store.read_arrow(path) if path.exists() else None
+
+
+class AlignedVintages:
+    """One state's metrics per vintage, as float arrays in the base partition's row order."""
+
+    def __init__(self, df, state_fips, base=BASE_VINTAGE):
+        self.state_fips = state_fips
+        self.base = base
+        self._tracts = df["CensusTract"].to_numpy()
+        counties = df["County"].astype("category")
+        self.counties = list(counties.cat.categories.astype(str))
+        self._county_codes = counties.cat.codes.to_numpy()
+        self._arrays = {base: {m: df[m].to_numpy(dtype="float64", na_value=np.nan) for m in METRICS if m in df}}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, vintage):
+        with self._lock:
+            arrays = self._arrays.get(vintage)
+            if arrays is not None:
+                self.hits += 1
+                return arrays
+            self.misses += 1
+            aligned = load_vintage(vintage, self.state_fips)
+            arrays = {}
+            if aligned is not None:
+                # One indexer join per vintage; base tracts missing from it get NaN
+                positions = pd.Index(aligned["CensusTract"]).get_indexer(self._tracts)
+                missing = positions < 0
+                for metric in METRICS:
+                    if metric in aligned:
+                        values = aligned[metric].to_numpy(dtype="float64", na_value=np.nan)[positions]
+                        values[missing] = np.nan
+                        arrays[metric] = values
+            self._arrays[vintage] = arrays
+            return arrays
+
+    def values(self, vintage, metric):
+        """``metric`` in ``vintage`` for every base tract (NaN where it cannot be compared)."""
+        values = self._load(vintage).get(metric)
+        return values if values is not None else np.full(len(self._tracts), np.nan)
+
+    def tract_delta(self, metric, old, new):
+        """Per-tract change in ``metric`` from vintage ``old`` to ``new``."""
+        return self.values(new, metric) - self.values(old, metric)
+
+    def county_delta(self, metric, old, new, rows=None):
+        """Per-county ``metric`` in both vintages and the change, over tracts comparable in both.
+
+        ``rows`` limits the comparison to those base rows.
+        """
+        before, after = self.values(old, metric), self.values(new, metric)
+        codes = self._county_codes
+        if rows is not None:
+            before, after, codes = before[rows], after[rows], codes[rows]
+        valid = ~np.isnan(before) & ~np.isnan(after) & (codes >= 0)
+        n = len(self.counties)
+        tracts = np.bincount(codes[valid], minlength=n)
+        before_total = np.bincount(codes[valid], weights=before[valid], minlength=n)
+        after_total = np.bincount(codes[valid], weights=after[valid], minlength=n)
+        if METRICS[metric][1] == "mean":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                before_total, after_total = before_total / tracts, after_total / tracts
+        summary = pd.DataFrame({"County": self.counties, old: before_total, new: after_total,
+                                "Change": after_total - before_total, "Tracts": tracts})
+        return summary[summary["Tracts"] > 0].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Align an earlier Atlas vintage to the current census tracts.")
+    parser.add_argument("vintage", help="vintage label, e.g. 2015")
+    parser.add_argument("source", help="the vintage's Atlas CSV")
+    parser.add_argument("--relationship", help="CSV of FromTract, ToTract[, Weight] for tracts that split or merged")
+    args = parser.parse_args()
+    manifest = build_vintage(args.vintage, args.source, args.relationship)
+    print(f"Wrote {VINTAGE_DIR / args.vintage} ({len(manifest['states'])} states, {len(manifest['metrics'])} metrics)")
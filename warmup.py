@@ -0,0 +1,98 @@
+"""Background cache warm-up.
+
+The first time a server process serves a state, the dashboard starts a
+``Warmup`` for it. A thread pool first loads the state's indexes, geometry
+and chart libraries concurrently. It then computes, through the app's own
+caches, the sections for the "All" view and the single-county selections,
+including every top tracts view. States with more counties than the caches
+hold warm only their largest counties. Sessions are served normally meanwhile:
+whatever is already warm is a cache hit, and the rest is computed on demand
+as before. Progress and timings are logged to ``food_access.warmup`` and
+reported in the sidebar.
+
+``FOOD_ACCESS_WARMUP=0`` turns it off. ``FOOD_ACCESS_WARMUP_WORKERS`` sets
+the pool size.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+ENABLED = os.environ.get("FOOD_ACCESS_WARMUP", "1") != "0"
+WORKERS = int(os.environ.get("FOOD_ACCESS_WARMUP_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+logger = logging.getLogger("food_access.warmup")
+if not logger.handlers:
+    # Timings go to the server log even though Streamlit only configures its own loggers
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Warmup:
+    """Runs stages of ``(label, callable)`` tasks on a thread pool, one stage after another."""
+
+    def __init__(self, name, stages, workers=WORKERS):
+        self.name = name
+        self.stages = stages
+        self.workers = workers
+        self.total = sum(len(tasks) for _, tasks in stages)
+        self.done = 0
+        self.failed = []
+        self.stage = None
+        self.seconds = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._finished = None
+        self._thread = threading.Thread(target=self._run, name=f"warmup-{name}", daemon=True)
+        self._thread.start()
+
+    def _task(self, label, func):
+        try:
+            func()
+        except Exception:
+            # A failed task only means that selection is computed on demand later
+            logger.exception("warm-up %s: %s failed", self.name, label)
+            with self._lock:
+                self.failed.append(label)
+        with self._lock:
+            self.done += 1
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"warmup-{self.name}") as pool:
+            for stage, tasks in self.stages:
+                self.stage = stage
+                started = time.perf_counter()
+                wait([pool.submit(self._task, label, func) for label, func in tasks])
+                self.seconds[stage] = time.perf_counter() - started
+                logger.info("warm-up %s: %s done in %.2f s (%d/%d tasks)",
+                            self.name, stage, self.seconds[stage], self.done, self.total)
+        self._finished = time.perf_counter()
+        logger.info("warm-up %s: finished in %.2f s, %d failed", self.name, self.elapsed, len(self.failed))
+
+    @property
+    def finished(self):
+        return self._finished is not None
+
+    @property
+    def elapsed(self):
+        return (self._finished or time.perf_counter()) - self._started
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+        return self.finished
+
+    def progress(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "stage": self.stage,
+                "done": self.done,
+                "total": self.total,
+                "failed": len(self.failed),
+                "elapsed_s": round(self.elapsed, 3),
+                "finished": self.finished,
+            }